@@ -1,27 +1,47 @@
 # bot/families.py
 import json, os, threading
 from pathlib import Path
-from typing import List, Set
+from typing import List, Optional, Set, Tuple
 
 class FamiliesStore:
     def __init__(self, path: str = "data/families.json"):
         self.path = Path(path)
         self._lock = threading.Lock()
+        # Parsed roster keyed by the file's (inode, mtime_ns, size); other
+        # instances write the same file, so the stamp is checked before use
+        self._cache: Set[int] = set()
+        self._stamp: Optional[Tuple[int, int, int]] = None
         self.path.parent.mkdir(parents=True, exist_ok=True)
         if not self.path.exists():
             self._write(set())
 
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
     def _read(self) -> Set[int]:
-        if not self.path.exists():
+        stamp = self._file_stamp()
+        if stamp is None:
             return set()
+        if stamp == self._stamp:
+            return set(self._cache)
         try:
             data = json.loads(self.path.read_text(encoding="utf-8"))
-            return set(int(x) for x in data)
+            s = set(int(x) for x in data)
         except Exception:
             return set()
+        self._cache, self._stamp = s, stamp
+        return set(s)
 
     def _write(self, s: Set[int]) -> None:
-        self.path.write_text(json.dumps(sorted(list(s))), encoding="utf-8")
+        # Replace rather than rewrite so every write gets a new inode
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(sorted(list(s))), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._cache, self._stamp = set(s), self._file_stamp()
 
     def add(self, chat_id: int) -> None:
         with self._lock:
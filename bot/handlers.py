@@ -3,17 +3,21 @@ Command and media handlers for Silli Bot
 """
 
 import os
-import json
 import tempfile
 import asyncio
 import time
+from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
+from types import MappingProxyType
+from uuid import uuid4
 from aiogram import Router, F
-from aiogram.types import Message, Voice, PhotoSize, Video, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
+from aiogram.types import Message, Voice, PhotoSize, Video, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, FSInputFile
 from aiogram.filters import Command
+import aiohttp
 from loguru import logger
-from .models import EventRecord, FeatureSummary, PwaSessionReport
+from pydantic_core import from_json
+from .models import EventRecord, FeatureSummary, PwaSessionReportAdapter
 from .storage import Storage
 from .analysis_audio import process_voice_note
 from .wt_utils import (
@@ -23,7 +27,8 @@ from .wt_utils import (
     get_env,
 )
 from .families import FamiliesStore
-from .reason_client import create_reasoner_config, ReasonClient, ReasonerUnavailable, clamp_metric_overrides, truncate_tips
+from .profiles import profiles
+from .reason_client import create_reasoner_config, get_shared_client, ReasonerUnavailable, clamp_metric_overrides, truncate_tips
 
 APP_VERSION = "v0.2.0-beta"
 STARTED_AT = datetime.now()
@@ -56,9 +61,9 @@ def summarize_last_events(family_id: str, limit: int = 5) -> list:
         List of compact event summaries
     """
     try:
-        events = storage.get_events(family_id)
-        # Get recent events, excluding the current one being processed
-        recent_events = sorted(events, key=lambda e: e.ts, reverse=True)[:limit]
+        # Tail the family's shard instead of loading its whole history
+        events = storage.get_recent_events(family_id, limit)
+        recent_events = sorted(events, key=lambda e: e.ts, reverse=True)
         
         summaries = []
         for event in recent_events:
@@ -125,6 +130,8 @@ def sanitize_for_reasoner(data: dict) -> dict:
     
     return sanitized
 
+PII_KEYS = ("name", "child_name", "email", "phone")
+
 def redact_pii_context(context: dict) -> dict:
     """
     Redact PII from context data
@@ -138,14 +145,11 @@ def redact_pii_context(context: dict) -> dict:
     if not isinstance(context, dict):
         return {}
     
-    pii_keys = ["name", "child_name", "email", "phone"]
-    redacted = context.copy()
-    
-    for key in pii_keys:
-        if key in redacted:
-            redacted[key] = "[REDACTED]"
-    
-    return redacted
+    # Copy only when something needs redacting; callers just serialize the result
+    found = [key for key in PII_KEYS if key in context]
+    if not found:
+        return context
+    return {**context, **dict.fromkeys(found, "[REDACTED]")}
 
 from .analysis_image import analyze_photo, get_lighting_tip
 from .analysis_video import analyze_video, get_motion_tip
@@ -180,19 +184,20 @@ async def start_command(message: Message):
             "🍽 Meal Mood Companion"
         )
         
-        await message.reply(onboarding_text, reply_markup=_dyad_kb())
+        await message.reply(onboarding_text, reply_markup=DYAD_KB)
         
         # Log onboarding event
-        event = EventRecord(
-            ts=datetime.now(),
+        now = datetime.now()
+        event = EventRecord.model_construct(
+            ts=now,
             family_id=family_id,
-            session_id=f"{family_id}_onboarding_{datetime.now().strftime('%Y%m%d_%H%M')}",
+            session_id=f"{family_id}_onboarding_{uuid4().hex[:8]}",
             phase="onboarding",
             actor="parent",
             event="onboarding",
             labels=["silli_introduced"]
         )
-        storage.append_event(event)
+        storage.enqueue_event(event)
         
         logger.info(f"Silli onboarding for family {family_id}")
         
@@ -218,16 +223,17 @@ async def consent_yes_command(message: Message):
         await message.reply(consent_text)
         
         # Log consent confirmed event
-        event = EventRecord(
-            ts=datetime.now(),
+        now = datetime.now()
+        event = EventRecord.model_construct(
+            ts=now,
             family_id=family_id,
-            session_id=f"{family_id}_consent_confirmed_{datetime.now().strftime('%Y%m%d_%H%M')}",
+            session_id=f"{family_id}_consent_confirmed_{uuid4().hex[:8]}",
             phase="consent",
             actor="parent",
             event="consent_confirmed",
             labels=["consent_granted"]
         )
-        storage.append_event(event)
+        storage.enqueue_event(event)
         
         logger.info(f"Consent confirmed for family {family_id}")
         
@@ -251,16 +257,17 @@ async def consent_no_command(message: Message):
         await message.reply(decline_text)
         
         # Log consent declined event
-        event = EventRecord(
-            ts=datetime.now(),
+        now = datetime.now()
+        event = EventRecord.model_construct(
+            ts=now,
             family_id=family_id,
-            session_id=f"{family_id}_consent_declined_{datetime.now().strftime('%Y%m%d_%H%M')}",
+            session_id=f"{family_id}_consent_declined_{uuid4().hex[:8]}",
             phase="consent",
             actor="parent",
             event="consent_declined",
             labels=["consent_declined"]
         )
-        storage.append_event(event)
+        storage.enqueue_event(event)
         
         logger.info(f"Consent declined for family {family_id}")
         
@@ -286,16 +293,17 @@ async def night_helper_command(message: Message):
         await message.reply(response_text)
         
         # Log night helper summon
-        event = EventRecord(
-            ts=datetime.now(),
+        now = datetime.now()
+        event = EventRecord.model_construct(
+            ts=now,
             family_id=family_id,
-            session_id=f"{family_id}_night_helper_{datetime.now().strftime('%Y%m%d_%H%M')}",
+            session_id=f"{family_id}_night_helper_{uuid4().hex[:8]}",
             phase="dyad_summon",
             actor="parent",
             event="night_helper_summoned",
             labels=["bedtime", "wind_down"]
         )
-        storage.append_event(event)
+        storage.enqueue_event(event)
         
         logger.info(f"Night helper summoned for family {family_id}")
         
@@ -319,16 +327,17 @@ async def tantrum_translator_command(message: Message):
         await message.reply(response_text)
         
         # Log tantrum translator summon
-        event = EventRecord(
-            ts=datetime.now(),
+        now = datetime.now()
+        event = EventRecord.model_construct(
+            ts=now,
             family_id=family_id,
-            session_id=f"{family_id}_tantrum_translator_{datetime.now().strftime('%Y%m%d_%H%M')}",
+            session_id=f"{family_id}_tantrum_translator_{uuid4().hex[:8]}",
             phase="dyad_summon",
             actor="parent",
             event="tantrum_translator_summoned",
             labels=["tantrum", "emotional_support"]
         )
-        storage.append_event(event)
+        storage.enqueue_event(event)
         
         logger.info(f"Tantrum translator summoned for family {family_id}")
         
@@ -352,16 +361,17 @@ async def meal_mood_command(message: Message):
         await message.reply(response_text)
         
         # Log meal mood summon
-        event = EventRecord(
-            ts=datetime.now(),
+        now = datetime.now()
+        event = EventRecord.model_construct(
+            ts=now,
             family_id=family_id,
-            session_id=f"{family_id}_meal_mood_{datetime.now().strftime('%Y%m%d_%H%M')}",
+            session_id=f"{family_id}_meal_mood_{uuid4().hex[:8]}",
             phase="dyad_summon",
             actor="parent",
             event="meal_mood_summoned",
             labels=["feeding", "meal_support"]
         )
-        storage.append_event(event)
+        storage.enqueue_event(event)
         
         logger.info(f"Meal mood companion summoned for family {family_id}")
         
@@ -370,24 +380,28 @@ async def meal_mood_command(message: Message):
         await message.reply("Sorry, something went wrong. Please try again.")
 
 
-def _dyad_kb():
-    """Create inline keyboard for Dyad selection."""
-    return InlineKeyboardMarkup(inline_keyboard=[[
-        InlineKeyboardButton(text="🛏 Night Helper", callback_data="dyad:night"),
-        InlineKeyboardButton(text="😤 Tantrum Translator", callback_data="dyad:tantrum"),
-        InlineKeyboardButton(text="🍽 Meal Companion", callback_data="dyad:meal"),
-    ]])
+# Inline keyboard for Dyad selection (static, built once at import)
+DYAD_KB = InlineKeyboardMarkup(inline_keyboard=[[
+    InlineKeyboardButton(text="🛏 Night Helper", callback_data="dyad:night"),
+    InlineKeyboardButton(text="😤 Tantrum Translator", callback_data="dyad:tantrum"),
+    InlineKeyboardButton(text="🍽 Meal Companion", callback_data="dyad:meal"),
+]])
+DYAD_NAMES = MappingProxyType({
+    "night": "Night Helper",
+    "tantrum": "Tantrum Translator",
+    "meal": "Meal Mood Companion"
+})
 
 
 @router.callback_query(F.data.startswith("dyad:"))
 async def choose_dyad_cb(q: CallbackQuery):
     """Handle Dyad selection callback."""
     try:
-        dyad = q.data.split(":")[1]  # night|tantrum|meal
+        dyad = q.data[len("dyad:"):]  # night|tantrum|meal
         family_id = f"fam_{q.message.chat.id}"
-        session_id = f"{family_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        now = datetime.now()
+        session_id = f"{family_id}_{now:%Y%m%d_%H%M%S}"
         
-        from .wt_utils import mint_autoingest_token, build_pwa_deeplink, get_env
         relay_secret = get_env("RELAY_SECRET")
         tok = mint_autoingest_token(
             chat_id=q.message.chat.id,
@@ -406,24 +420,18 @@ async def choose_dyad_cb(q: CallbackQuery):
             dyad=dyad,   # NEW
         )
         
-        dyad_names = {
-            "night": "Night Helper",
-            "tantrum": "Tantrum Translator", 
-            "meal": "Meal Mood Companion"
-        }
-        
         await q.message.edit_text(
-            f"📱 {dyad_names[dyad]} is ready.\n"
+            f"📱 {DYAD_NAMES[dyad]} is ready.\n"
             f"When you tap Start, your phone will listen locally for a few minutes and compute a score.\n"
             f"Privacy: no raw audio leaves the device.",
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
-                InlineKeyboardButton(text=f"Start {dyad_names[dyad]}", url=link)
+                InlineKeyboardButton(text=f"Start {DYAD_NAMES[dyad]}", url=link)
             ]])
         )
         
         # Log dyad summon
-        event = EventRecord(
-            ts=datetime.now(),
+        event = EventRecord.model_construct(
+            ts=now,
             family_id=family_id,
             session_id=session_id,
             phase="dyad_summon",
@@ -431,7 +439,7 @@ async def choose_dyad_cb(q: CallbackQuery):
             event="dyad_summoned",
             labels=[f"dyad:{dyad}"]
         )
-        storage.append_event(event)
+        storage.enqueue_event(event)
         
         logger.info(f"Dyad {dyad} summoned for family {family_id}")
         
@@ -447,21 +455,22 @@ async def dyads_command(message: Message):
         families.add(int(message.chat.id))
         await message.reply(
             "Choose a helper:",
-            reply_markup=_dyad_kb()
+            reply_markup=DYAD_KB
         )
         
         # Log dyads command
         family_id = f"fam_{message.chat.id}"
-        event = EventRecord(
-            ts=datetime.now(),
+        now = datetime.now()
+        event = EventRecord.model_construct(
+            ts=now,
             family_id=family_id,
-            session_id=f"{family_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            session_id=f"{family_id}_{now:%Y%m%d_%H%M%S}",
             phase="dyad_selection",
             actor="parent",
             event="dyads_command",
             labels=["dyad_selection"]
         )
-        storage.append_event(event)
+        storage.enqueue_event(event)
         
         logger.info(f"Dyads command requested for family {family_id}")
         
@@ -502,7 +511,6 @@ async def version_cmd(message: Message):
 async def health_cmd(message: Message):
     ok_worker = "unknown"
     try:
-        import aiohttp, os
         url = os.getenv("RELAY_PULL_URL", "")
         secret = os.getenv("RELAY_SECRET", "")
         if url and secret:
@@ -527,25 +535,25 @@ async def summon_helper_command(message: Message):
     try:
         families.add(int(message.chat.id))
         # Log profile completeness for debugging
-        from bot.profiles import profiles
         profile = await profiles.get_profile_by_chat(message.chat.id)
         logger.info(f"/summon_helper: profile_complete={getattr(profile, 'complete', None)} for chat_id={message.chat.id}")
         await message.reply(
             "Choose a helper:",
-            reply_markup=_dyad_kb()
+            reply_markup=DYAD_KB
         )
         # Log summon event
         family_id = f"fam_{message.chat.id}"
-        event = EventRecord(
-            ts=datetime.now(),
+        now = datetime.now()
+        event = EventRecord.model_construct(
+            ts=now,
             family_id=family_id,
-            session_id=f"{family_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            session_id=f"{family_id}_{now:%Y%m%d_%H%M%S}",
             phase="dyad_selection",
             actor="parent",
             event="summon_helper",
             labels=["dyad_selection"]
         )
-        storage.append_event(event)
+        storage.enqueue_event(event)
         logger.info(f"Dyad selection requested for family {family_id}")
     except Exception as e:
         logger.error(f"Error in summon_helper command: {e}")
@@ -573,16 +581,17 @@ async def privacy_offline_command(message: Message):
         await message.reply("Acknowledged: Bot will not send proactive messages. We only reply to direct inputs.")
         
         # Log privacy event
-        event = EventRecord(
-            ts=datetime.now(),
+        now = datetime.now()
+        event = EventRecord.model_construct(
+            ts=now,
             family_id=family_id,
-            session_id=f"{family_id}_privacy_{datetime.now().strftime('%Y%m%d_%H%M')}",
+            session_id=f"{family_id}_privacy_{uuid4().hex[:8]}",
             phase="adhoc",
             actor="parent",
             event="privacy_offline",
             labels=["privacy_acknowledged"]
         )
-        storage.append_event(event)
+        storage.enqueue_event(event)
         
         logger.info(f"Privacy offline acknowledged for family {family_id}")
         
@@ -622,10 +631,9 @@ async def handle_voice(message: Message):
     """Handle voice note messages."""
     try:
         family_id = f"fam_{message.chat.id}"
-        session_id = f"{family_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        session_id = f"{family_id}_{datetime.now():%Y%m%d_%H%M%S}"
         
         # Process voice note using new pipeline with concurrency control
-        from .analysis_audio import process_voice_note
         async with VOICE_SEM:
             result, card_path = await process_voice_note(
                 message.bot, message.voice.file_id, family_id, session_id
@@ -651,16 +659,16 @@ async def handle_voice(message: Message):
                     "history": summarize_last_events(family_id, limit=3)  # Last 3 events for voice
                 }
                 
-                async with ReasonClient(cfg.base_url, cfg.timeout_s) as rc:
-                    t0 = time.monotonic()
-                    rsp = await rc.infer(req)
-                    dt_ms = int((time.monotonic() - t0) * 1000)
-                    
-                    # Extract cache status and tips count
-                    cache_status = rsp.get("cache_status", "MISS")
-                    tips_count = len(rsp.get("tips", []))
-                    
-                    logger.info(f"reasoner_call dyad=night cache={cache_status} latency_ms={dt_ms} tips={tips_count}")
+                rc = await get_shared_client(cfg)
+                t0 = time.monotonic()
+                rsp = await rc.infer(req)
+                dt_ms = int((time.monotonic() - t0) * 1000)
+                
+                # Extract cache status and tips count
+                cache_status = rsp.get("cache_status", "MISS")
+                tips_count = len(rsp.get("tips", []))
+                
+                logger.info(f"reasoner_call dyad=night cache={cache_status} latency_ms={dt_ms} tips={tips_count}")
             except ReasonerUnavailable:
                 logger.warning("reasoner_call dyad=night cache=N/A latency_ms=0 tips=0 (unavailable)")
         else:
@@ -692,13 +700,12 @@ async def handle_voice(message: Message):
                 tip = truncated_tips[0]  # Take first tip only
                 reply_text += f"\n\n💡 Suggested next step: {tip}"
         
-        from aiogram.types import FSInputFile
         photo = FSInputFile(card_path)
-        await message.reply_photo(photo, caption=reply_text, reply_markup=_dyad_kb())
+        await message.reply_photo(photo, caption=reply_text, reply_markup=DYAD_KB)
         
         # Log voice analyzed event with dyad label
         event = EventRecord(
-            ts=datetime.now(),
+            ts=datetime.now(),  # when analysis finished; session_id keeps receipt time
             family_id=family_id,
             session_id=session_id,
             phase="adhoc",
@@ -709,7 +716,7 @@ async def handle_voice(message: Message):
             score=result['score'],
             suggestion_id="wind_down_v1"
         )
-        storage.append_event(event)
+        storage.enqueue_event(event)
         
         logger.info(f"Voice analyzed for family {family_id}, score={result['score']}")
         
@@ -723,15 +730,16 @@ async def handle_photo(message: Message):
     """Handle photo messages (stub implementation)."""
     try:
         family_id = f"fam_{message.chat.id}"
-        session_id = f"{family_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        now = datetime.now()
+        session_id = f"{family_id}_{now:%Y%m%d_%H%M%S}"
         
         # Download photo (stub - would need actual implementation)
         # For now, just acknowledge
         await message.reply("📸 Photo analysis coming soon! For now, try sending a voice note with /analyze.")
         
         # Log photo event (stub)
-        event = EventRecord(
-            ts=datetime.now(),
+        event = EventRecord.model_construct(
+            ts=now,
             family_id=family_id,
             session_id=session_id,
             phase="adhoc",
@@ -739,7 +747,7 @@ async def handle_photo(message: Message):
             event="photo_analyzed",
             labels=["stub_implementation"]
         )
-        storage.append_event(event)
+        storage.enqueue_event(event)
         
         logger.info(f"Photo received for family {family_id} (stub)")
         
@@ -753,15 +761,16 @@ async def handle_video(message: Message):
     """Handle video messages (stub implementation)."""
     try:
         family_id = f"fam_{message.chat.id}"
-        session_id = f"{family_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        now = datetime.now()
+        session_id = f"{family_id}_{now:%Y%m%d_%H%M%S}"
         
         # Download video (stub - would need actual implementation)
         # For now, just acknowledge
         await message.reply("🎥 Video analysis coming soon! For now, try sending a voice note with /analyze.")
         
         # Log video event (stub)
-        event = EventRecord(
-            ts=datetime.now(),
+        event = EventRecord.model_construct(
+            ts=now,
             family_id=family_id,
             session_id=session_id,
             phase="adhoc",
@@ -769,7 +778,7 @@ async def handle_video(message: Message):
             event="video_analyzed",
             labels=["stub_implementation"]
         )
-        storage.append_event(event)
+        storage.enqueue_event(event)
         
         logger.info(f"Video received for family {family_id} (stub)")
         
@@ -804,20 +813,21 @@ async def handle_text(message: Message):
         if dyad and dyad in ["night", "tantrum", "meal"]:
             await message.reply(
                 "Got it. Open a helper:",
-                reply_markup=_dyad_kb()
+                reply_markup=DYAD_KB
             )
             
             # Log dyad trigger
-            event = EventRecord(
-                ts=datetime.now(),
+            now = datetime.now()
+            event = EventRecord.model_construct(
+                ts=now,
                 family_id=family_id,
-                session_id=f"{family_id}_{dyad}_trigger_{datetime.now().strftime('%Y%m%d_%H%M')}",
+                session_id=f"{family_id}_{dyad}_trigger_{uuid4().hex[:8]}",
                 phase="dyad_trigger",
                 actor="parent",
                 event=f"{dyad}_triggered",
                 labels=[f"dyad:{dyad}", "natural_language"]
             )
-            storage.append_event(event)
+            storage.enqueue_event(event)
             return
             
         # Unrecognized input - Silli's learning response
@@ -876,15 +886,16 @@ async def ingest_json_handler(message: Message):
         with tempfile.NamedTemporaryFile(delete=False, suffix=".json") as tf:
             await message.bot.download_file(file.file_path, tf.name)
             temp_path = tf.name
-        with open(temp_path, "r", encoding="utf-8") as f:
-            payload = json.load(f)
+        with open(temp_path, "rb") as f:
+            # Parse the raw bytes with pydantic's Rust JSON parser
+            payload = from_json(f.read())
         
         logger.info(f"Loaded JSON payload with keys: {list(payload.keys())}")
         
         # Convert PWA format to bot format if needed
         converted_payload = convert_pwa_to_bot_format(payload)
         logger.info(f"Converted payload with session_id: {converted_payload.get('session_id')}")
-        report = PwaSessionReport(**converted_payload)
+        report = PwaSessionReportAdapter.validate_python(converted_payload)
         
         # Prefer long score, fallback to mid/short
         long_score = None
@@ -913,7 +924,7 @@ async def ingest_json_handler(message: Message):
             metrics=metrics,
             suggestion_id=None
         )
-        storage.append_event(event)
+        storage.enqueue_event(event)
         logger.info(f"Successfully created ingest_session_report event for session: {report.session_id}")
         
         # Build reasoning request
@@ -931,16 +942,16 @@ async def ingest_json_handler(message: Message):
         cache_status = "N/A"
         if await is_reasoner_effectively_enabled(report.family_id) and cfg.base_url:
             try:
-                async with ReasonClient(cfg.base_url, cfg.timeout_s) as rc:
-                    t0 = time.monotonic()
-                    rsp = await rc.infer(req)
-                    dt_ms = int((time.monotonic() - t0) * 1000)
-                    
-                    # Extract cache status and tips count
-                    cache_status = rsp.get("cache_status", "MISS")
-                    tips_count = len(rsp.get("tips", []))
-                    
-                    logger.info(f"reasoner_call dyad={dyad} cache={cache_status} latency_ms={dt_ms} tips={tips_count}")
+                rc = await get_shared_client(cfg)
+                t0 = time.monotonic()
+                rsp = await rc.infer(req)
+                dt_ms = int((time.monotonic() - t0) * 1000)
+                
+                # Extract cache status and tips count
+                cache_status = rsp.get("cache_status", "MISS")
+                tips_count = len(rsp.get("tips", []))
+                
+                logger.info(f"reasoner_call dyad={dyad} cache={cache_status} latency_ms={dt_ms} tips={tips_count}")
             except ReasonerUnavailable:
                 logger.warning("reasoner_call dyad={dyad} cache=N/A latency_ms=0 tips=0 (unavailable)")
         else:
@@ -977,7 +988,7 @@ async def ingest_json_handler(message: Message):
         }
         
         # Update the event in storage with reasoning data
-        storage.append_event(event)
+        storage.enqueue_event(event)
         
         # Prepare summary with dyad-specific metrics
         trend = report.score.get("trend") if isinstance(report.score, dict) else None
@@ -1032,19 +1043,18 @@ async def tag_voice(message: Message):
             return await message.reply("Invalid tag. Use: quiet | speech | tv_music | white_noise")
         
         # Get the most recent session (voice or PWA)
-        events = storage.get_events(family_id)
-        voice_events = [e for e in events if e.event == "voice_analyzed"]
-        pwa_events = [e for e in events if e.event == "pwa_session_complete"]
+        latest_session = None
+        for e in storage.get_events(family_id):
+            if e.event in ("voice_analyzed", "pwa_session_complete") and (
+                    latest_session is None or e.ts > latest_session.ts):
+                latest_session = e
         
-        if not voice_events and not pwa_events:
+        if latest_session is None:
             return await message.reply("No recent sessions to tag. Send a voice clip or run a PWA session first.")
         
-        # Get the most recent session
-        all_sessions = voice_events + pwa_events
-        latest_session = max(all_sessions, key=lambda e: e.ts)
         sid = latest_session.session_id
         
-        storage.append_event(EventRecord(
+        storage.enqueue_event(EventRecord.model_construct(
             ts=datetime.now(), family_id=family_id, session_id=sid,
             phase="adhoc", actor="parent", event="tag_voice",
             labels=[label]
@@ -1067,12 +1077,15 @@ async def list_voice_notes(message: Message):
         # Get all events for this family
         events = storage.get_events(family_id)
         
-        from collections import defaultdict
+        # One pass: sessions by day, and the latest tag per session
         by_day = defaultdict(list)
+        tags = {}
         for e in events:
-            if e.event in ["voice_analyzed", "pwa_session_complete", "ingest_session_report"]:
+            if e.event in ("voice_analyzed", "pwa_session_complete", "ingest_session_report"):
                 day = e.ts.strftime("%Y-%m-%d")
                 by_day[day].append(e)
+            elif e.event == "tag_voice":
+                tags[e.session_id] = e.labels[0] if e.labels else "—"
 
         days = sorted(by_day.keys(), reverse=True)[:3]  # last 3 days
         lines = [f"📊 Sessions (last {len(days)} day(s))"]
@@ -1082,10 +1095,7 @@ async def list_voice_notes(message: Message):
             for e in sorted(by_day[d], key=lambda x: x.ts, reverse=True):
                 short_id = e.session_id.split("_")[-1] if "_" in e.session_id else e.session_id[-8:]
                 score = e.score if e.score is not None else "—"
-                tag = "—"
-                for t in reversed([x for x in events if x.event == "tag_voice" and x.session_id == e.session_id]):
-                    tag = t.labels[0] if t.labels else "—"
-                    break
+                tag = tags.get(e.session_id, "—")
                 emoji = "🎵" if e.event == "voice_analyzed" else "📱"
                 line = f"{emoji} {short_id} · score {score} · tag {tag}"
                 if hasattr(e, 'labels') and e.labels:
@@ -1249,24 +1259,29 @@ async def tag_session(message: Message):
         if label not in ["quiet", "speech", "tv_music", "white_noise"]:
             return await message.reply("Invalid tag. Use: quiet | speech | tv_music | white_noise")
         
-        # Get all voice analyzed and PWA session events for this family
-        events = storage.get_events(family_id)
-        voice_events = [e for e in events if e.event == "voice_analyzed"]
-        pwa_events = [e for e in events if e.event in ["pwa_session_complete", "ingest_session_report"]]
-        
-        # Find the session by short_id (check both voice and PWA sessions)
-        target_session = None
-        for event in voice_events + pwa_events:
+        # Find the session by short_id in one pass; voice sessions win over PWA ones
+        matches = {}
+        for event in storage.get_events(family_id):
+            if event.event == "voice_analyzed":
+                kind = "voice"
+            elif event.event in ("pwa_session_complete", "ingest_session_report"):
+                kind = "pwa"
+            else:
+                continue
+            if kind in matches:
+                continue
             session_id = event.session_id
             session_short_id = session_id.split("_")[-1] if "_" in session_id else session_id[-8:]
             if session_short_id == short_id:
-                target_session = session_id
-                break
+                matches[kind] = session_id
+                if kind == "voice":
+                    break
+        target_session = matches.get("voice") or matches.get("pwa")
         
         if not target_session:
             return await message.reply(f"Session {short_id} not found. Use `/list` to see available sessions.")
         
-        storage.append_event(EventRecord(
+        storage.enqueue_event(EventRecord.model_construct(
             ts=datetime.now(), family_id=family_id, session_id=target_session,
             phase="adhoc", actor="parent", event="tag_voice",
             labels=[label]
@@ -1282,45 +1297,38 @@ async def tag_session(message: Message):
 
 def convert_pwa_to_bot_format(pwa_data: dict) -> dict:
     """Convert PWA session format to bot format."""
-    # Extract features summary and convert format
-    features_summary = pwa_data.get('features_summary', {})
-    converted_features = {
-        'level_dbfs': features_summary.get('level_dbfs_p50', -60),
-        'centroid_norm': features_summary.get('centroid_norm_mean', 0),
-        'rolloff_norm': 0,  # PWA doesn't provide this
-        'flux_norm': features_summary.get('flux_norm_mean', 0),
-        'vad_fraction': features_summary.get('vad_fraction', 0),
-        'stationarity': features_summary.get('stationarity', 0)
-    }
+    # Runs for every pulled or posted session; bind the lookups once and
+    # build the result as a single literal
+    get = pwa_data.get
+    features_get = get('features_summary', {}).get
     
-    # Convert score format
-    score_data = pwa_data.get('score', {})
-    if isinstance(score_data, dict):
-        # Use the mid-term score as the main score
-        converted_score = score_data.get('mid', 0)
-    else:
-        converted_score = score_data
+    # Convert score format; use the mid-term score as the main score
+    score_data = get('score', {})
+    converted_score = score_data.get('mid', 0) if type(score_data) is dict else score_data
     
-    # Create converted data
-    converted_data = {
-        'ts_start': pwa_data.get('ts_start', ''),
-        'duration_s': pwa_data.get('duration_s', 0),
-        'mode': pwa_data.get('mode', 'helper'),
-        'family_id': pwa_data.get('family_id', ''),
-        'session_id': pwa_data.get('session_id', ''),
-        'scales': pwa_data.get('scales', {}),
-        'features_summary': converted_features,
+    return {
+        'ts_start': get('ts_start', ''),
+        'duration_s': get('duration_s', 0),
+        'mode': get('mode', 'helper'),
+        'family_id': get('family_id', ''),
+        'session_id': get('session_id', ''),
+        'scales': get('scales', {}),
+        'features_summary': {
+            'level_dbfs': features_get('level_dbfs_p50', -60),
+            'centroid_norm': features_get('centroid_norm_mean', 0),
+            'rolloff_norm': 0,  # PWA doesn't provide this
+            'flux_norm': features_get('flux_norm_mean', 0),
+            'vad_fraction': features_get('vad_fraction', 0),
+            'stationarity': features_get('stationarity', 0)
+        },
         'score': converted_score,
-        'badges': pwa_data.get('badges', []),
-        'events': pwa_data.get('events', []),
-        'pii': pwa_data.get('pii', False),
-        'version': pwa_data.get('version', 'pwa_0.1')
+        'badges': get('badges', []),
+        'events': get('events', []),
+        'pii': get('pii', False),
+        'version': get('version', 'pwa_0.1'),
+        'context': get('context'),
+        'metrics': get('metrics')
     }
-    
-    converted_data["context"] = pwa_data.get("context")
-    converted_data["metrics"] = pwa_data.get("metrics")
-    
-    return converted_data
 
 async def is_reasoner_effectively_enabled(family_id: str) -> bool:
     """
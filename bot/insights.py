@@ -3,11 +3,19 @@ from collections import Counter
 from typing import List, Dict
 from .models import EventRecord
 
+_DYAD_LABELS = {'dyad:night': 'night', 'dyad:tantrum': 'tantrum', 'dyad:meal': 'meal'}
+
+
 def compute_insights(events: List[EventRecord]) -> Dict[str, str]:
     now = datetime.now()
     week_ago = now - timedelta(days=7)
-    # Filter to last 7 days
-    events = [e for e in events if hasattr(e, 'ts') and e.ts >= week_ago]
+    # One pass: keep the last 7 days and bucket by dyad label
+    by_dyad: Dict[str, List[EventRecord]] = {dyad: [] for dyad in _DYAD_LABELS.values()}
+    for e in events:
+        if not (hasattr(e, 'ts') and e.ts >= week_ago) or not e.labels:
+            continue
+        for dyad in {_DYAD_LABELS[l] for l in e.labels if l in _DYAD_LABELS}:
+            by_dyad[dyad].append(e)
     out = {}
 
     # Night
@@ -15,16 +23,15 @@ def compute_insights(events: List[EventRecord]) -> Dict[str, str]:
     night_badge_hits = 0
     night_total = 0
     night_rationales = []
-    for e in events:
-        if e.labels and any(l == 'dyad:night' for l in e.labels):
-            if e.score is not None:
-                night_scores.append(e.score)
-            if e.labels and any(b in e.labels for b in ['Speech', 'Fluctuating']):
-                night_badge_hits += 1
-            night_total += 1
-            # Collect rationales from reasoning context
-            if e.context and e.context.get('reasoning', {}).get('rationale'):
-                night_rationales.append(e.context['reasoning']['rationale'])
+    for e in by_dyad['night']:
+        if e.score is not None:
+            night_scores.append(e.score)
+        if e.labels and any(b in e.labels for b in ['Speech', 'Fluctuating']):
+            night_badge_hits += 1
+        night_total += 1
+        # Collect rationales from reasoning context
+        if e.context and e.context.get('reasoning', {}).get('rationale'):
+            night_rationales.append(e.context['reasoning']['rationale'])
     
     if night_scores:
         avg_score = round(sum(night_scores) / len(night_scores))
@@ -47,15 +54,14 @@ def compute_insights(events: List[EventRecord]) -> Dict[str, str]:
     tan_esc = []
     triggers = []
     tantrum_rationales = []
-    for e in events:
-        if e.labels and any(l == 'dyad:tantrum' for l in e.labels):
-            if e.metrics and e.metrics.get('escalation_index') is not None:
-                tan_esc.append(e.metrics['escalation_index'])
-            if e.context and e.context.get('trigger'):
-                triggers.append(e.context['trigger'])
-            # Collect rationales from reasoning context
-            if e.context and e.context.get('reasoning', {}).get('rationale'):
-                tantrum_rationales.append(e.context['reasoning']['rationale'])
+    for e in by_dyad['tantrum']:
+        if e.metrics and e.metrics.get('escalation_index') is not None:
+            tan_esc.append(e.metrics['escalation_index'])
+        if e.context and e.context.get('trigger'):
+            triggers.append(e.context['trigger'])
+        # Collect rationales from reasoning context
+        if e.context and e.context.get('reasoning', {}).get('rationale'):
+            tantrum_rationales.append(e.context['reasoning']['rationale'])
     
     if tan_esc:
         avg_esc = sum(tan_esc) / len(tan_esc)
@@ -78,15 +84,14 @@ def compute_insights(events: List[EventRecord]) -> Dict[str, str]:
     meal_moods = []
     eaten_pcts = []
     meal_rationales = []
-    for e in events:
-        if e.labels and any(l == 'dyad:meal' for l in e.labels):
-            if e.metrics and e.metrics.get('meal_mood') is not None:
-                meal_moods.append(e.metrics['meal_mood'])
-            if e.context and e.context.get('eaten_pct') is not None:
-                eaten_pcts.append(e.context['eaten_pct'])
-            # Collect rationales from reasoning context
-            if e.context and e.context.get('reasoning', {}).get('rationale'):
-                meal_rationales.append(e.context['reasoning']['rationale'])
+    for e in by_dyad['meal']:
+        if e.metrics and e.metrics.get('meal_mood') is not None:
+            meal_moods.append(e.metrics['meal_mood'])
+        if e.context and e.context.get('eaten_pct') is not None:
+            eaten_pcts.append(e.context['eaten_pct'])
+        # Collect rationales from reasoning context
+        if e.context and e.context.get('reasoning', {}).get('rationale'):
+            meal_rationales.append(e.context['reasoning']['rationale'])
     
     if meal_moods:
         avg_mood = round(sum(meal_moods) / len(meal_moods))
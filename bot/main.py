@@ -4,6 +4,7 @@ Main entry point for Silli Bot
 
 import os
 import sys
+import shutil
 import asyncio
 from pathlib import Path
 from dotenv import load_dotenv
@@ -12,29 +13,51 @@ from dotenv import load_dotenv
 load_dotenv()
 from aiogram import Bot, Dispatcher
 from loguru import logger
-from .handlers import router
-from .puller import start_pull_loop
+from .handlers import router, storage as event_storage
 from aiogram import types
 from .middlewares import ProfileGateMiddleware
 from bot.profiles import profiles
 from .handlers_profile import router_profile
-from .handlers_insights import router_insights
-from .reason_client import create_reasoner_config
+from .reason_client import create_reasoner_config, close_shared_client
+
+
+# Strong references to long-running background tasks (asyncio only keeps weak ones)
+BACKGROUND_TASKS = set()
+
+
+def _log_task_exit(task: asyncio.Task) -> None:
+    """Done-callback so a crashed background loop is logged instead of vanishing."""
+    BACKGROUND_TASKS.discard(task)
+    if task.cancelled():
+        logger.info(f"Background task {task.get_name()} cancelled")
+    elif task.exception() is not None:
+        logger.opt(exception=task.exception()).error(f"Background task {task.get_name()} died")
+
+
+def start_background_task(coro, name: str) -> asyncio.Task:
+    """Start a named, supervised background task."""
+    task = asyncio.create_task(coro, name=name)
+    BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_log_task_exit)
+    return task
 
 
 def setup_logging():
     """Setup logging configuration."""
     # Remove default handler
     logger.remove()
+    level = os.getenv("LOG_LEVEL", "INFO")
     
-    # Add console handler
-    logger.add(
-        sys.stdout,
-        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-        level=os.getenv("LOG_LEVEL", "INFO")
-    )
+    # Add console handler only when someone is watching (debugging or a terminal);
+    # in production the file sink alone is enough
+    if level.upper() == "DEBUG" or sys.stdout.isatty():
+        logger.add(
+            sys.stdout,
+            format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
+            level=level
+        )
     
-    # Add file handler
+    # Add file handler; enqueue hands records to loguru's writer thread
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
     
@@ -43,7 +66,9 @@ def setup_logging():
         rotation="1 day",
         retention="7 days",
         format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-        level=os.getenv("LOG_LEVEL", "INFO")
+        level=level,
+        enqueue=True,
+        buffering=8192
     )
 
 
@@ -56,37 +81,50 @@ def check_dependencies():
         logger.error("ffmpeg-python not found. Please install: pip install ffmpeg-python")
         return False
     
-    # Check if ffmpeg is installed on system
-    import subprocess
-    try:
-        subprocess.run(["ffmpeg", "-version"], capture_output=True, check=True)
-        logger.info("ffmpeg system command available")
-    except (subprocess.CalledProcessError, FileNotFoundError):
+    # Check if ffmpeg is installed on system (PATH lookup, no process spawn)
+    ffmpeg_path = shutil.which("ffmpeg")
+    if ffmpeg_path is None:
         logger.error("ffmpeg not found on system. Please install: brew install ffmpeg (macOS)")
         return False
+    logger.info(f"ffmpeg system command available: {ffmpeg_path}")
     
     return True
 
 
+def create_fsm_storage():
+    """FSM storage: Redis when REDIS_URL is set (shared across workers), else in-process memory."""
+    redis_url = os.getenv("REDIS_URL")
+    if not redis_url:
+        from aiogram.fsm.storage.memory import MemoryStorage
+        return MemoryStorage()
+    # Imported lazily: the redis client is only needed for multi-worker deployments
+    from aiogram.fsm.storage.redis import RedisStorage, DefaultKeyBuilder
+    logger.info("Using Redis FSM storage")
+    return RedisStorage.from_url(redis_url, key_builder=DefaultKeyBuilder(with_bot_id=True))
+
+
+# Command menu shown by Telegram, built once at import
+BOT_COMMANDS = (
+    types.BotCommand(command="start", description="Begin and consent to the privacy notice"),
+    types.BotCommand(command="help", description="See all available commands"),
+    types.BotCommand(command="onboard", description="Set up your Family Profile"),
+    types.BotCommand(command="summon_helper", description="Open the Parent Night Helper (PWA)"),
+    types.BotCommand(command="analyze", description="Send a voice note for Wind-Down analysis"),
+    types.BotCommand(command="insights", description="View AI-aided insights from your sessions"),
+    types.BotCommand(command="dyads", description="Show all helpers (Dyads)"),
+    types.BotCommand(command="privacy_offline", description="Stop proactive messages (reply-only mode)"),
+    types.BotCommand(command="export", description="Download your derived event log (JSONL)"),
+    types.BotCommand(command="ingest", description="Upload a PWA session JSON report"),
+    types.BotCommand(command="reason_on", description="Enable AI-powered insights for your family"),
+    types.BotCommand(command="reason_off", description="Disable AI-powered insights for your family"),
+    types.BotCommand(command="reason_status", description="Check AI insights status for your family"),
+    types.BotCommand(command="reason_stats", description="View reasoner performance statistics (admin)"),
+    # Add more as needed
+)
+
+
 async def set_commands(bot):
-    commands = [
-        types.BotCommand(command="start", description="Begin and consent to the privacy notice"),
-        types.BotCommand(command="help", description="See all available commands"),
-        types.BotCommand(command="onboard", description="Set up your Family Profile"),
-        types.BotCommand(command="summon_helper", description="Open the Parent Night Helper (PWA)"),
-        types.BotCommand(command="analyze", description="Send a voice note for Wind-Down analysis"),
-        types.BotCommand(command="insights", description="View AI-aided insights from your sessions"),
-        types.BotCommand(command="dyads", description="Show all helpers (Dyads)"),
-        types.BotCommand(command="privacy_offline", description="Stop proactive messages (reply-only mode)"),
-        types.BotCommand(command="export", description="Download your derived event log (JSONL)"),
-        types.BotCommand(command="ingest", description="Upload a PWA session JSON report"),
-        types.BotCommand(command="reason_on", description="Enable AI-powered insights for your family"),
-        types.BotCommand(command="reason_off", description="Disable AI-powered insights for your family"),
-        types.BotCommand(command="reason_status", description="Check AI insights status for your family"),
-        types.BotCommand(command="reason_stats", description="View reasoner performance statistics (admin)"),
-        # Add more as needed
-    ]
-    await bot.set_my_commands(commands)
+    await bot.set_my_commands(list(BOT_COMMANDS))
 
 
 async def main():
@@ -112,18 +150,30 @@ async def main():
         
         # Create bot and dispatcher
         bot = Bot(token=bot_token)
-        dp = Dispatcher()
-        dp.update.middleware(ProfileGateMiddleware(profiles))
+        dp = Dispatcher(storage=create_fsm_storage())
+        # Gate messages and button presses; on dp.update the middleware would
+        # only ever see Update objects and let everything through. The typed
+        # hooks skip the per-event isinstance dispatch in __call__
+        profile_gate = ProfileGateMiddleware(profiles)
+        dp.message.middleware(profile_gate.on_message)
+        dp.callback_query.middleware(profile_gate.on_callback_query)
+        dp.shutdown.register(close_shared_client)
         
         # Include routers (order matters - more specific routers first)
         from .onboarding import router_onboarding
         dp.include_router(router_onboarding)  # Include first for state management
         dp.include_router(router_profile)
+        from .handlers_insights import router_insights
         dp.include_router(router_insights)
         dp.include_router(router)  # Main router last (catch-all)
         
-        # Start background pull loop
-        asyncio.create_task(start_pull_loop(bot))
+        # Start background event writer and pull loop
+        start_background_task(event_storage.run_writer(), "event_writer")
+        from .puller import start_pull_loop, storage as pull_storage
+        start_background_task(pull_storage.run_writer(), "relay_event_writer")
+        start_background_task(start_pull_loop(bot), "relay_pull_loop")
+        # Compact the profiles log replayed at import, now that the loop is up
+        profiles.start()
         
         # Register commands
         await set_commands(bot)
@@ -144,8 +194,16 @@ async def main():
         else:
             logger.info("Reasoner disabled - AI insights will not be available")
         
-        # Start polling
-        await dp.start_polling(bot)
+        # Discard the getUpdates backlog accumulated while the bot was down so
+        # new users are served immediately instead of after a full replay
+        if os.getenv("DROP_PENDING_UPDATES", "true").lower() in ("1", "true", "yes", "on"):
+            await bot.delete_webhook(drop_pending_updates=True)
+            logger.info("Dropped pending updates from before startup")
+        
+        # Start polling. Each update is handled in its own task, so a slow
+        # handler (reasoner call, voice analysis) doesn't hold up the next one;
+        # long-poll timeout keeps getUpdates round trips down when idle
+        await dp.start_polling(bot, handle_as_tasks=True, polling_timeout=30)
         
     except KeyboardInterrupt:
         logger.info("Shutting down Silli Bot...")
@@ -1,55 +1,105 @@
 import os
+import time
+from typing import Dict, Iterable, Optional, Tuple
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.dispatcher.flags import get_flag
-from bot.profiles import ProfilesStore
+from bot.profiles import FamilyProfile, ProfilesStore
 from loguru import logger
 
+ONBOARD_KB = InlineKeyboardMarkup(
+    inline_keyboard=[[InlineKeyboardButton(text="Start Onboarding", callback_data="/onboard")]]
+)
+
 class ProfileGateMiddleware(BaseMiddleware):
     def __init__(self, profiles_store: ProfilesStore, require_profile: bool = True):
         super().__init__()
         self.profiles_store = profiles_store
         self.require_profile = require_profile
         self.allowed_commands = [
-            "/start", "/help", "/onboard", "/version", "/health", "/privacy_offline"
+            "/start", "/help", "/onboard", "/version", "/health", "/privacy_offline",
+            "/join", "/cancel"
         ]
+        # Command names without the slash, for an O(1) check of the first token
+        self._allowed_set = frozenset(c.lstrip("/") for c in self.allowed_commands)
+        # chat_id -> (fetched_at, profile or None); dropped when the store reports a change
+        self._cache: Dict[int, Tuple[float, Optional[FamilyProfile]]] = {}
+        self.cache_ttl = float(os.getenv("PROFILE_CACHE_TTL", "30"))
+        self.cache_max = int(os.getenv("PROFILE_CACHE_MAX", "4096"))
+        if profiles_store is not None:
+            profiles_store.add_listener(self.invalidate)
 
-    async def __call__(self, handler, event, data):
-        if not self.require_profile:
-            return await handler(event, data)
+    def invalidate(self, chat_ids: Iterable[int]) -> None:
+        """Drop cached profile lookups for these chats."""
+        for chat_id in chat_ids:
+            self._cache.pop(chat_id, None)
+
+    async def _get_profile(self, chat_id: int) -> Optional[FamilyProfile]:
+        """get_profile_by_chat with a short TTL cache in front of it."""
+        now = time.monotonic()
+        cached = self._cache.get(chat_id)
+        if cached and now - cached[0] < self.cache_ttl:
+            return cached[1]
+        profile = await self.profiles_store.get_profile_by_chat(chat_id)
+        if len(self._cache) >= self.cache_max:
+            # Evict the oldest entry (dicts keep insertion order)
+            self._cache.pop(next(iter(self._cache)))
+        self._cache.pop(chat_id, None)
+        self._cache[chat_id] = (now, profile)
+        return profile
+
+    def _is_allowed(self, text: str) -> bool:
+        """True if text starts with an always-allowed command (optionally /cmd@bot)."""
+        if text[:1] != "/":
+            return False
+        first = text.split(None, 1)[0]
+        return first.split("@", 1)[0][1:] in self._allowed_set
 
-        chat_id = None
-        text = None
+    async def __call__(self, handler, event, data):
+        """Generic entry point; main.py registers the typed hooks below directly."""
         if isinstance(event, Message):
-            chat_id = event.chat.id
-            text = event.text or ""
-        elif isinstance(event, CallbackQuery):
-            chat_id = event.message.chat.id
-            text = event.data or ""
-        else:
-            return await handler(event, data)
+            return await self.on_message(handler, event, data)
+        if isinstance(event, CallbackQuery):
+            return await self.on_callback_query(handler, event, data)
+        return await handler(event, data)
+
+    async def _is_blocked(self, chat_id: int, text: str, data) -> bool:
+        """True if this chat must finish onboarding before the event is handled."""
+        if not self.require_profile:
+            return False
 
         # Allow certain commands always
-        if text.startswith(tuple(self.allowed_commands)):
-            return await handler(event, data)
+        if self._is_allowed(text):
+            return False
+
+        # Let onboarding answers and buttons through while the FSM is mid-flow
+        if data.get("raw_state"):
+            return False
 
         # Check profile
-        profile = await self.profiles_store.get_profile_by_chat(chat_id)
+        profile = await self._get_profile(chat_id)
         if not profile or not profile.complete:
             logger.info(f"ProfileGate: blocking chat {chat_id} (profile incomplete)")
-            kb = InlineKeyboardMarkup(
-                inline_keyboard=[[InlineKeyboardButton(text="Start Onboarding", callback_data="/onboard")]]
+            return True
+        return False
+
+    async def on_message(self, handler, event: Message, data):
+        """Gate for dp.message."""
+        if await self._is_blocked(event.chat.id, event.text or "", data):
+            await event.reply(
+                "Let’s finish your family profile first. Tap to start.",
+                reply_markup=ONBOARD_KB
+            )
+            return  # Cancel handler execution by returning early
+        return await handler(event, data)
+
+    async def on_callback_query(self, handler, event: CallbackQuery, data):
+        """Gate for dp.callback_query."""
+        if await self._is_blocked(event.message.chat.id, event.data or "", data):
+            await event.message.reply(
+                "Let’s finish your family profile first. Tap to start.",
+                reply_markup=ONBOARD_KB
             )
-            if isinstance(event, Message):
-                await event.reply(
-                    "Let’s finish your family profile first. Tap to start.",
-                    reply_markup=kb
-                )
-            elif isinstance(event, CallbackQuery):
-                await event.message.reply(
-                    "Let’s finish your family profile first. Tap to start.",
-                    reply_markup=kb
-                )
-                await event.answer()
+            await event.answer()
             return  # Cancel handler execution by returning early
-        return await handler(event, data)
\ No newline at end of file
+        return await handler(event, data)
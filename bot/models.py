@@ -4,7 +4,7 @@ Pydantic models for Silli Bot data contracts
 
 from datetime import datetime
 from typing import List, Dict, Optional, Union
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 
 class FeatureSummary(BaseModel):
@@ -33,6 +33,10 @@ class PwaSessionReport(BaseModel):
     version: str = Field("pwa_0.1", description="PWA version")
 
 
+# Built once; validating through the adapter reuses the compiled core schema
+PwaSessionReportAdapter = TypeAdapter(PwaSessionReport)
+
+
 class EventRecord(BaseModel):
     """Event record for JSONL logging."""
     ts: datetime = Field(..., description="Timestamp with timezone")
@@ -1,11 +1,12 @@
+import re
 import asyncio
 from aiogram import Router, F
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command
-from typing import List
-from bot.profiles import profiles, Child
+from typing import Optional
+from bot.profiles import profiles
 from loguru import logger
 
 # ========== STATES ==========
@@ -34,6 +35,34 @@ TIMEZONES = [
     "UTC"
 ]
 SEX_LABELS = {"m": "Boy", "f": "Girl", "na": "N/A"}
+_SKIP_WORDS = frozenset({"skip", "none", "no", ""})
+_TAG_RE = re.compile(r"[^,\s][^,]*[^,\s]|[^,\s]")
+_AGE_RE = re.compile(r"\s*(\d+)\s*")
+_DECIMAL_AGE_RE = re.compile(r"\s*(\d+(?:\.\d*)?|\.\d+)\s*")
+
+# Keyboards are immutable, so build them once at import time
+_TZ_KB = InlineKeyboardMarkup(
+    inline_keyboard=[[InlineKeyboardButton(text=tz, callback_data=f"tz:{tz}")] for tz in TIMEZONES]
+)
+_SEX_KB = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text=label, callback_data=f"sex:{code}") for code, label in SEX_LABELS.items()]
+    ]
+)
+_ADD_CHILD_KB = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="Add another child", callback_data="add_child:yes")],
+        [InlineKeyboardButton(text="Continue", callback_data="add_child:no")]
+    ]
+)
+_FINISH_KB = InlineKeyboardMarkup(
+    inline_keyboard=[[
+        InlineKeyboardButton(text="Finish & Open Dyads", callback_data="confirm:yes")
+    ]]
+)
+_OPEN_DYADS_KB = InlineKeyboardMarkup(
+    inline_keyboard=[[InlineKeyboardButton(text="Open Dyads", callback_data="open_dyads")]]
+)
 
 # ========== HANDLERS ==========
 @router_onboarding.message(Command("onboard"))
@@ -44,7 +73,16 @@ async def start_onboarding(message: Message, state: FSMContext):
         "Let's set up your Family Profile.\n\nWhat's your first name?",
     )
 
-@router_onboarding.message(OnboardStates.AskParentName)
+@router_onboarding.callback_query(F.data=="/onboard")
+async def start_onboarding_cb(cb: CallbackQuery, state: FSMContext):
+    """Handle the "Start Onboarding" button shown by the profile gate."""
+    await state.clear()
+    await state.set_state(OnboardStates.AskParentName)
+    await cb.message.reply(
+        "Let's set up your Family Profile.\n\nWhat's your first name?",
+    )
+    await cb.answer()
+
 async def ask_parent_age(message: Message, state: FSMContext):
     name = message.text.strip()
     if not name or len(name) < 2:
@@ -54,23 +92,18 @@ async def ask_parent_age(message: Message, state: FSMContext):
     await state.set_state(OnboardStates.AskParentAge)
     await message.reply("How old are you? (optional, send a number or skip)")
 
-@router_onboarding.message(OnboardStates.AskParentAge)
 async def ask_timezone(message: Message, state: FSMContext):
-    text = message.text.strip()
+    match = _AGE_RE.fullmatch(message.text or "")
     age = None
-    if text.isdigit():
-        age = int(text)
+    if match:
+        age = int(match.group(1))
         if not (12 <= age <= 100):
             await message.reply("Please enter a reasonable age (12-100), or skip.")
             return
     await state.update_data(parent_age=age)
     await state.set_state(OnboardStates.AskTimezone)
-    kb = InlineKeyboardMarkup(
-        inline_keyboard=[[InlineKeyboardButton(text=tz, callback_data=f"tz:{tz}")] for tz in TIMEZONES]
-    )
-    await message.reply("Pick your timezone:", reply_markup=kb)
+    await message.reply("Pick your timezone:", reply_markup=_TZ_KB)
 
-@router_onboarding.callback_query(F.data.startswith("tz:"), OnboardStates.AskTimezone)
 async def ask_child_name(cb: CallbackQuery, state: FSMContext):
     tz = cb.data.split(":", 1)[1]
     await state.update_data(timezone=tz)
@@ -78,7 +111,6 @@ async def ask_child_name(cb: CallbackQuery, state: FSMContext):
     await cb.message.edit_text(f"Timezone set to {tz}.\n\nWhat's your child's first name?")
     await cb.answer()
 
-@router_onboarding.message(OnboardStates.AskChildName)
 async def ask_child_age(message: Message, state: FSMContext):
     name = message.text.strip()
     if not name or len(name) < 2:
@@ -88,53 +120,36 @@ async def ask_child_age(message: Message, state: FSMContext):
     await state.set_state(OnboardStates.AskChildAge)
     await message.reply(f"How old is {name}? (years, e.g. 4.5)")
 
-@router_onboarding.message(OnboardStates.AskChildAge)
 async def ask_child_sex(message: Message, state: FSMContext):
-    try:
-        age = float(message.text.strip())
-        if not (0 < age < 25):
-            await message.reply("Please enter a reasonable age (0-25). Try again.")
-            return
-    except Exception:
+    match = _DECIMAL_AGE_RE.fullmatch(message.text or "")
+    if not match:
         await message.reply("Please enter a number, e.g. 4.5")
         return
+    age = float(match.group(1))
+    if not (0 < age < 25):
+        await message.reply("Please enter a reasonable age (0-25). Try again.")
+        return
     await state.update_data(child_age=age)
     await state.set_state(OnboardStates.AskChildSex)
-    kb = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="Boy", callback_data="sex:m"),
-             InlineKeyboardButton(text="Girl", callback_data="sex:f"),
-             InlineKeyboardButton(text="N/A", callback_data="sex:na")]
-        ]
-    )
-    await message.reply("Select your child's sex:", reply_markup=kb)
+    await message.reply("Select your child's sex:", reply_markup=_SEX_KB)
 
-@router_onboarding.callback_query(F.data.startswith("sex:"), OnboardStates.AskChildSex)
 async def ask_add_another_child(cb: CallbackQuery, state: FSMContext):
     sex = cb.data.split(":", 1)[1]
     data = await state.get_data()
-    child = Child(
-        name=data["child_name"],
-        age_years=data["child_age"],
-        sex=sex
+    name, age = data["child_name"], data["child_age"]
+    # Children are kept as parallel columns, matching FamilyProfile
+    await state.update_data(
+        child_names=data.get("child_names", []) + [name],
+        child_ages=data.get("child_ages", []) + [age],
+        child_sexes=data.get("child_sexes", []) + [sex],
     )
-    children: List[Child] = data.get("children", [])
-    children.append(child)
-    await state.update_data(children=children)
     await state.set_state(OnboardStates.AskAddAnotherChild)
-    kb = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="Add another child", callback_data="add_child:yes")],
-            [InlineKeyboardButton(text="Continue", callback_data="add_child:no")]
-        ]
-    )
     await cb.message.edit_text(
-        f"Added {child.name} ({child.age_years}y, {SEX_LABELS[sex]}).\n\nAdd another child?",
-        reply_markup=kb
+        f"Added {name} ({age}y, {SEX_LABELS[sex]}).\n\nAdd another child?",
+        reply_markup=_ADD_CHILD_KB
     )
     await cb.answer()
 
-@router_onboarding.callback_query(F.data.startswith("add_child:"), OnboardStates.AskAddAnotherChild)
 async def add_another_child(cb: CallbackQuery, state: FSMContext):
     if cb.data.endswith(":yes"):
         await state.set_state(OnboardStates.AskChildName)
@@ -144,123 +159,144 @@ async def add_another_child(cb: CallbackQuery, state: FSMContext):
         await cb.message.edit_text("Any health notes? (optional, or skip)")
     await cb.answer()
 
-@router_onboarding.message(OnboardStates.AskHealthNotes)
 async def ask_lifestyle_tags(message: Message, state: FSMContext):
     notes = message.text.strip()
     await state.update_data(health_notes=notes)
     await state.set_state(OnboardStates.AskLifestyleTags)
     await message.reply("Any lifestyle tags? (comma-separated, e.g. vegetarian, outdoor_activities)\nOr skip.")
 
-@router_onboarding.message(OnboardStates.AskLifestyleTags)
 async def confirm(message: Message, state: FSMContext):
     text = message.text.strip().lower()
-    
-    # Handle different input formats
-    if text in ["skip", "none", "no", ""]:
-        tags = []
-    elif "," in text:
-        # Comma-separated tags
-        tags = [t.strip() for t in text.split(",") if t.strip()]
-    else:
-        # Single tag
-        tags = [text] if text else []
+    # Comma-separated (or single) tags, trimmed; skip-words mean no tags
+    tags = [] if text in _SKIP_WORDS else _TAG_RE.findall(text)
     
     await state.update_data(lifestyle_tags=tags)
     await state.set_state(OnboardStates.Confirm)
     data = await state.get_data()
     
     # Enhanced summary with lifestyle tags
-    summary = f"Profile summary:\n\n👤 {data.get('parent_name','')}\nTimezone: {data.get('timezone','UTC')}\nChildren: {', '.join([c.name for c in data.get('children',[])])}"
+    summary = f"Profile summary:\n\n👤 {data.get('parent_name','')}\nTimezone: {data.get('timezone','UTC')}\nChildren: {', '.join(data.get('child_names',[]))}"
     if tags:
         summary += f"\nLifestyle: {', '.join(tags)}"
     
-    kb = InlineKeyboardMarkup(
-        inline_keyboard=[[
-            InlineKeyboardButton(text="Finish & Open Dyads", callback_data="confirm:yes")
-        ]]
-    )
-    await message.reply(summary, reply_markup=kb)
+    await message.reply(summary, reply_markup=_FINISH_KB)
+
+# Chats whose confirm:yes is being processed; a double tap finds its chat here
+_finishing: set = set()
+# Strong references to in-flight profile saves (the loop only keeps weak ones)
+_persist_tasks: set = set()
 
 @router_onboarding.callback_query(F.data=="confirm:yes")
 async def finish(cb: CallbackQuery, state: FSMContext):
-    logger.info(f"Finish callback triggered for chat {cb.message.chat.id}")
+    chat_id = cb.message.chat.id
+    logger.info(f"Finish callback triggered for chat {chat_id}")
+    if chat_id in _finishing:
+        await cb.answer("Saving...")
+        return
+    _finishing.add(chat_id)
+    handed_off = False
     try:
+        # Completion sentinel: only a chat sitting on the summary can finish;
+        # a repeat click after the save finds the state already cleared
+        if await state.get_state() != OnboardStates.Confirm.state:
+            existing = await profiles.get_profile_by_chat(chat_id)
+            if existing and existing.complete:
+                await cb.answer("Already saved")
+            else:
+                await cb.answer("This setup has expired, please /onboard again", show_alert=True)
+            return
+        
         data = await state.get_data()
-        chat_id = cb.message.chat.id
-        logger.info(f"State data: {data}")
+        logger.debug("State data: {}", data)
         
-        if not data.get("children"):
+        if not data.get("child_names"):
             await cb.message.edit_text("You must add at least one child.")
             await state.set_state(OnboardStates.AskChildName)
+            await cb.answer()
             return
         
-        # Create or get profile first, then update fields
-        logger.info(f"Creating/getting profile for chat {chat_id}")
-        try:
-            # Use a simpler approach - just create the family_id directly
-            family_id = f"fam_{chat_id}"
-            logger.info(f"Using family_id: {family_id}")
-            
-            # Check if profile already exists
-            existing_profile = await profiles.get_profile_by_chat(chat_id)
-            if existing_profile:
-                logger.info(f"Profile already exists: {existing_profile.family_id}")
-            else:
-                logger.info("Profile doesn't exist, will create during upsert")
-        except Exception as e:
-            logger.error(f"Error creating profile: {e}")
-            await cb.answer(f"Error creating profile: {str(e)}", show_alert=True)
-            return
-        
-        try:
-            # First, ensure the profile exists
-            if not existing_profile:
-                logger.info(f"Creating profile for {family_id}")
-                # Create a minimal profile manually
-                minimal_profile = profiles._create_minimal_profile(chat_id)
-                # Add it to the index manually
-                profiles._index[family_id] = minimal_profile
-                profiles._save_index()
-                logger.info(f"Minimal profile created manually: {minimal_profile.family_id}")
-            
-            # Now update the fields
-            await profiles.upsert_fields(
-                family_id,
-                parent_name=data.get("parent_name",""),
-                parent_age=data.get("parent_age"),
-                timezone=data.get("timezone","UTC"),
-                children=data.get("children",[]),
-                health_notes=data.get("health_notes",""),
-                lifestyle_tags=data.get("lifestyle_tags",[])
-            )
-            logger.info(f"Profile fields updated for {family_id}")
-        except Exception as e:
-            logger.error(f"Error updating profile fields: {e}")
-            await cb.answer(f"Error updating profile: {str(e)}", show_alert=True)
-            return
+        # Ack the button right away; the save and the message edit follow
+        await cb.answer("Saving...")
+        task = asyncio.create_task(_persist_profile(cb.message, state, data))
+        _persist_tasks.add(task)
+        task.add_done_callback(_persist_tasks.discard)
+        handed_off = True
         
+    except Exception as e:
+        logger.error(f"Error in finish callback: {e}")
+        await cb.answer(f"Error: {str(e)}", show_alert=True)
+    finally:
+        if not handed_off:
+            _finishing.discard(chat_id)
+
+async def _persist_profile(message: Message, state: FSMContext, data: dict):
+    """Save the onboarding answers; runs after finish() has acked the callback."""
+    chat_id = message.chat.id
+    try:
+        # create_or_get registers the chat in the store's chat index and is
+        # atomic under the family lock
+        profile = await profiles.create_or_get(chat_id)
+        family_id = profile.family_id
+        await profiles.upsert_fields(
+            family_id,
+            parent_name=data.get("parent_name",""),
+            parent_age=data.get("parent_age"),
+            timezone=data.get("timezone","UTC"),
+            child_names=data.get("child_names",[]),
+            child_ages=data.get("child_ages",[]),
+            child_sexes=data.get("child_sexes",[]),
+            health_notes=data.get("health_notes",""),
+            lifestyle_tags=data.get("lifestyle_tags",[])
+        )
         await profiles.mark_complete(family_id, True)
-        logger.info(f"Profile marked complete for {family_id}")
+        logger.debug("Profile saved and marked complete for {}", family_id)
         
         await state.clear()
-        await cb.message.edit_text(
+        await message.edit_text(
             "Profile saved. You can now use Silli's helpers.",
-            reply_markup=InlineKeyboardMarkup(
-                inline_keyboard=[[InlineKeyboardButton(text="Open Dyads", callback_data="open_dyads")]]
-            )
+            reply_markup=_OPEN_DYADS_KB
         )
-        await cb.answer()
         logger.info(f"Onboarding completed successfully for {family_id}")
-        
     except Exception as e:
-        logger.error(f"Error in finish callback: {e}")
-        await cb.answer(f"Error: {str(e)}", show_alert=True)
+        logger.error(f"Error saving profile for chat {chat_id}: {e}")
+        await message.answer(f"Sorry, saving your profile failed: {e}\nTap Finish to try again.")
+    finally:
+        _finishing.discard(chat_id)
 
 @router_onboarding.callback_query(F.data=="open_dyads")
 async def open_dyads(cb: CallbackQuery, state: FSMContext):
     await cb.message.edit_text("Use /dyads to open the helpers.")
     await cb.answer()
 
+# ========== STATE DISPATCH ==========
+# Step handlers are looked up by the raw FSM state (and callback prefix) in a
+# single dict access instead of being registered one filter chain each.
+_MSG_TABLE = {
+    OnboardStates.AskParentName.state: ask_parent_age,
+    OnboardStates.AskParentAge.state: ask_timezone,
+    OnboardStates.AskChildName.state: ask_child_age,
+    OnboardStates.AskChildAge.state: ask_child_sex,
+    OnboardStates.AskHealthNotes.state: ask_lifestyle_tags,
+    OnboardStates.AskLifestyleTags.state: confirm,
+}
+_CB_TABLE = {
+    (OnboardStates.AskTimezone.state, "tz"): ask_child_name,
+    (OnboardStates.AskChildSex.state, "sex"): ask_add_another_child,
+    (OnboardStates.AskAddAnotherChild.state, "add_child"): add_another_child,
+}
+
+def _message_step(message: Message, raw_state: Optional[str] = None):
+    handler = _MSG_TABLE.get(raw_state)
+    return {"step": handler} if handler else False
+
+def _callback_step(cb: CallbackQuery, raw_state: Optional[str] = None):
+    handler = _CB_TABLE.get((raw_state, (cb.data or "").split(":", 1)[0]))
+    return {"step": handler} if handler else False
+
+@router_onboarding.callback_query(_callback_step)
+async def dispatch_callback(cb: CallbackQuery, state: FSMContext, step):
+    await step(cb, state)
+
 # Debug handler to catch any unhandled callback queries (only for onboarding-specific callbacks)
 @router_onboarding.callback_query(lambda cb: cb.data.startswith(("confirm:", "open_dyads", "tz:", "sex:", "add_child:")))
 async def debug_callback(cb: CallbackQuery, state: FSMContext):
@@ -271,4 +307,9 @@ async def debug_callback(cb: CallbackQuery, state: FSMContext):
 @router_onboarding.message(Command("cancel"))
 async def cancel_onboarding(message: Message, state: FSMContext):
     await state.clear()
-    await message.reply("Onboarding cancelled.")
\ No newline at end of file
+    await message.reply("Onboarding cancelled.")
+
+# Registered after /cancel so commands win over the free-text steps
+@router_onboarding.message(_message_step)
+async def dispatch_message(message: Message, state: FSMContext, step):
+    await step(message, state)
@@ -4,26 +4,36 @@ Family Profiles - Append-only log + snapshot storage
 Provides family profile management with:
 - Pydantic models with validation
 - Append-only JSONL logging
-- Fast snapshot indexing
+- Per-family snapshot files (data/profiles/<family_id>.json)
 - Thread-safe operations
 - Join code system
 """
 
 import asyncio
+import atexit
+import heapq
 import json
+import os
+import orjson
 import secrets
 import string
+import time
+import weakref
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Literal, Optional, Any
-from pydantic import BaseModel, Field
+from typing import Callable, Dict, Iterable, List, Literal, Optional, Tuple, Any
+from pydantic import BaseModel, Field, model_validator
+from pydantic.dataclasses import dataclass
 from loguru import logger
-import collections.abc
+from collections import OrderedDict
 
 
 # ==================== PYDANTIC MODELS ====================
 
-class Child(BaseModel):
+# A slotted pydantic dataclass: validated like a model, without a per-instance __dict__
+@dataclass(slots=True, frozen=True)
+class Child:
     name: str
     age_years: float
     sex: Literal["m", "f", "na"]
@@ -36,7 +46,10 @@ class FamilyProfile(BaseModel):
     parent_name: str
     parent_age: Optional[int] = None
     timezone: str = "UTC"  # IANA tz
-    children: List[Child] = []
+    # Children are stored column-wise; use the `children` property for records
+    child_names: List[str] = []
+    child_ages: List[float] = []
+    child_sexes: List[Literal["m", "f", "na"]] = []
     health_notes: str = ""
     lifestyle_tags: List[str] = []
     cloud_reasoning: bool = False  # Per-family reasoner toggle
@@ -44,24 +57,102 @@ class FamilyProfile(BaseModel):
     updated_at: datetime
     version: int = 1
     complete: bool = False  # gates the bot
+    
+    @model_validator(mode="before")
+    @classmethod
+    def _split_children(cls, data: Any) -> Any:
+        """Accept the old `children: [...]` shape (snapshots, logs, callers)."""
+        if isinstance(data, dict) and "children" in data:
+            data = dict(data)
+            data.update(children_columns(data.pop("children") or []))
+        return data
+    
+    @property
+    def children(self) -> List[Child]:
+        return [
+            Child(name=name, age_years=age, sex=sex)
+            for name, age, sex in zip(self.child_names, self.child_ages, self.child_sexes)
+        ]
+    
+    @children.setter
+    def children(self, children: Iterable[Child]) -> None:
+        for key, column in children_columns(children).items():
+            setattr(self, key, column)
+
+
+_FIELDS = frozenset(FamilyProfile.model_fields)
+
+
+def children_columns(children: Iterable[Any]) -> Dict[str, list]:
+    """Split Child records (or their dicts) into FamilyProfile's child columns."""
+    names, ages, sexes = [], [], []
+    for child in children:
+        if isinstance(child, dict):
+            child = Child(**child)
+        names.append(child.name)
+        ages.append(child.age_years)
+        sexes.append(child.sex)
+    return {"child_names": names, "child_ages": ages, "child_sexes": sexes}
 
 
 # ==================== PROFILES STORE ====================
 
-def _jsonl_safe(obj):
-    """Recursively convert datetimes to ISO strings for JSONL logging."""
-    if isinstance(obj, datetime):
-        return obj.isoformat()
-    elif isinstance(obj, list):
-        return [_jsonl_safe(x) for x in obj]
-    elif isinstance(obj, dict):
-        return {k: _jsonl_safe(v) for k, v in obj.items()}
-    elif isinstance(obj, collections.abc.Mapping):
-        return {k: _jsonl_safe(v) for k, v in obj.items()}
-    elif hasattr(obj, 'dict'):
-        return _jsonl_safe(obj.dict())
-    else:
-        return obj
+def _json_default(obj):
+    """orjson fallback for pydantic models (Child dataclasses are encoded natively)."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+class _CompactionGate:
+    """
+    Lets any number of mutations run at once, or one compaction alone.
+    
+    A mutation changes memory and then appends its log line; compaction must
+    not snapshot and truncate in between. Waiters use futures created on the
+    running loop, so the gate isn't tied to one event loop.
+    """
+    
+    def __init__(self):
+        self._active = 0
+        self._compacting = False
+        self._waiters: List[asyncio.Future] = []
+    
+    def _wake(self) -> None:
+        waiters, self._waiters = self._waiters, []
+        for fut in waiters:
+            if not fut.done():
+                fut.set_result(None)
+    
+    async def _wait(self) -> None:
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        await fut
+    
+    @asynccontextmanager
+    async def mutation(self):
+        while self._compacting:
+            await self._wait()
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            if not self._active:
+                self._wake()
+    
+    @asynccontextmanager
+    async def compaction(self):
+        while self._compacting:
+            await self._wait()
+        self._compacting = True  # new mutations queue from here on
+        try:
+            while self._active:
+                await self._wait()
+            yield
+        finally:
+            self._compacting = False
+            self._wake()
+
 
 class ProfilesStore:
     def __init__(self, data_dir: str = "data"):
@@ -69,29 +160,64 @@ class ProfilesStore:
         self.data_dir.mkdir(exist_ok=True)
         
         self.profiles_log_path = self.data_dir / "profiles.jsonl"
+        self.profiles_dir = self.data_dir / "profiles"  # created on first snapshot
+        # Legacy single-file snapshot; migrated into profiles_dir on first load
         self.profiles_index_path = self.data_dir / "profiles_index.json"
         self.join_codes_path = self.data_dir / "join_codes.json"
+        # chat_id -> family_id, so chat lookups don't need every profile in memory
+        self.chat_index_path = self.data_dir / "chat_index.json"
         
-        self._lock = None
-        self._index: Dict[str, FamilyProfile] = {}
+        # One lock per family, so unrelated families never queue on each other;
+        # entries disappear once no coroutine holds or waits on them
+        self._family_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._join_lock = asyncio.Lock()  # join codes are shared across families
+        self._gate = _CompactionGate()
+        # LRU of loaded profiles; others are read from disk on first access
+        self._index: "OrderedDict[str, FamilyProfile]" = OrderedDict()
+        self.cache_size = int(os.getenv("PROFILES_CACHE_SIZE", "1024"))
+        self._chat_to_family: Dict[int, str] = {}
+        
+        # profiles.jsonl is the source of truth; snapshots are compacted from
+        # memory every snapshot_interval seconds or compact_every events,
+        # after which the log is truncated
+        self.snapshot_interval = float(os.getenv("PROFILES_SNAPSHOT_INTERVAL", "5"))
+        self.compact_every = int(os.getenv("PROFILES_COMPACT_EVERY", "1000"))
+        self._events_since_snapshot = 0
+        self._dirty: Dict[str, FamilyProfile] = {}
+        self._flushing: Dict[str, FamilyProfile] = {}
+        self._chat_index_dirty = False
+        self._flush_task: Optional[asyncio.Task] = None
+        self._compact_now: Optional[asyncio.Event] = None
+        # One unbuffered O_APPEND handle for the log: each event is a single write()
+        self._log_fh = open(self.profiles_log_path, 'ab', buffering=0)
+        atexit.register(self._log_fh.close)
+        self._flush_at_exit = False
         self._join_codes: Dict[str, Dict[str, Any]] = {}
+        # (expires_epoch, code) min-heap so GC only touches expired codes
+        self._join_expiry: List[Tuple[float, str]] = []
+        # Callbacks told which chat ids changed membership/profile (cache invalidation)
+        self._listeners: List[Callable[[Iterable[int]], None]] = []
         
-        # Load existing data
+        # Load existing data into memory only; nothing is written until start()
+        # or the first mutation, so constructing a store never compacts its log
         self._load_index()
+        self._replay_log()
         self._load_join_codes()
     
-    def _get_lock(self):
-        """Get or create the asyncio lock."""
-        if self._lock is None:
-            try:
-                self._lock = asyncio.Lock()
-            except RuntimeError:
-                # If we're not in an event loop, create a dummy lock
-                class DummyLock:
-                    async def __aenter__(self): pass
-                    async def __aexit__(self, *args): pass
-                self._lock = DummyLock()
-        return self._lock
+    def _lock_for(self, family_id: str) -> asyncio.Lock:
+        """Lock serializing mutations of one family."""
+        lock = self._family_locks.get(family_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._family_locks[family_id] = lock
+        return lock
+    
+    @asynccontextmanager
+    async def _mutating(self, family_id: str):
+        """Hold a family's lock inside the compaction gate."""
+        async with self._gate.mutation():
+            async with self._lock_for(family_id):
+                yield
     
     def _create_minimal_profile(self, chat_id: int) -> FamilyProfile:
         """Create a minimal profile stub."""
@@ -107,35 +233,299 @@ class ProfilesStore:
             updated_at=now
         )
     
+    def add_listener(self, callback: Callable[[Iterable[int]], None]) -> None:
+        """Register a callback invoked with the chat ids whose profile changed."""
+        self._listeners.append(callback)
+    
+    def _notify(self, chat_ids: Iterable[int]) -> None:
+        """Tell listeners that the profile seen by these chats changed."""
+        chat_ids = list(chat_ids)
+        for callback in self._listeners:
+            try:
+                callback(chat_ids)
+            except Exception as e:
+                logger.error(f"Profile listener failed: {e}")
+    
+    def _profile_path(self, family_id: str) -> Path:
+        """Snapshot file for one family."""
+        return self.profiles_dir / f"{family_id}.json"
+    
     def _load_index(self) -> None:
-        """Load profiles index from JSON file."""
+        """Load the chat -> family index; profiles themselves load lazily."""
         try:
-            if self.profiles_index_path.exists():
-                with open(self.profiles_index_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self._index = {
-                        family_id: FamilyProfile(**profile_data)
-                        for family_id, profile_data in data.items()
-                    }
-                logger.info(f"Loaded {len(self._index)} profiles from index")
-            else:
-                logger.info("No profiles index found, starting fresh")
+            if self.chat_index_path.exists():
+                data = orjson.loads(self.chat_index_path.read_bytes())
+                self._chat_to_family = {int(k): v for k, v in data.items()}
+                logger.info(f"Loaded chat index for {len(self._chat_to_family)} chats")
+                return
+            
+            if not any(self.profiles_dir.glob("*.json")) and self.profiles_index_path.exists():
+                self._migrate_legacy_index()
+            self._rebuild_chat_index()
         except Exception as e:
-            logger.error(f"Error loading profiles index: {e}")
-            self._index = {}
+            logger.error(f"Error loading chat index: {e}")
+            self._chat_to_family = {}
     
-    def _save_index(self) -> None:
-        """Save profiles index to JSON file."""
+    def _rebuild_chat_index(self) -> None:
+        """Scan every snapshot once to rebuild the chat index (saved on compaction)."""
+        self._chat_to_family = {}
+        for path in self.profiles_dir.glob("*.json"):
+            try:
+                data = orjson.loads(path.read_bytes())
+                for chat_id in data.get("members", []):
+                    self._chat_to_family[int(chat_id)] = data["family_id"]
+            except Exception as e:
+                logger.error(f"Error indexing profile {path.name}: {e}")
+        for profile in self._dirty.values():  # migrated but not yet snapshotted
+            for chat_id in profile.members:
+                self._chat_to_family[chat_id] = profile.family_id
+        if self._chat_to_family:
+            self._chat_index_dirty = True
+            logger.info(f"Rebuilt chat index for {len(self._chat_to_family)} chats")
+        else:
+            logger.info("No profiles found, starting fresh")
+    
+    def _migrate_legacy_index(self) -> None:
+        """Load the old profiles_index.json; compaction splits it into per-family files."""
+        with open(self.profiles_index_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for family_id, profile_data in data.items():
+            profile = FamilyProfile(**profile_data)
+            self._remember(profile)
+            self._dirty[profile.family_id] = profile
+        logger.info(f"Migrated {len(data)} profiles from {self.profiles_index_path.name}")
+    
+    def _save_chat_index(self, chat_index: Optional[Dict[int, str]] = None) -> bool:
+        """Atomically write the chat -> family index (or a copy of it); True on success."""
         try:
-            data = {
-                family_id: profile.dict()
-                for family_id, profile in self._index.items()
-            }
-            with open(self.profiles_index_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, default=str)
-            logger.debug(f"Saved {len(self._index)} profiles to index")
+            tmp_path = self.chat_index_path.with_suffix(".json.tmp")
+            tmp_path.write_bytes(orjson.dumps(
+                self._chat_to_family if chat_index is None else chat_index,
+                option=orjson.OPT_NON_STR_KEYS
+            ))
+            os.replace(tmp_path, self.chat_index_path)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving chat index: {e}")
+            return False
+    
+    def _load_profile(self, family_id: str) -> Optional[FamilyProfile]:
+        """Read one family's snapshot from disk."""
+        path = self._profile_path(family_id)
+        if not path.exists():
+            return None
+        try:
+            return FamilyProfile.model_validate_json(path.read_bytes())
+        except Exception as e:
+            logger.error(f"Error loading profile {family_id}: {e}")
+            return None
+    
+    def _remember(self, profile: FamilyProfile) -> None:
+        """Put a profile in the LRU, evicting the least recently used."""
+        self._index[profile.family_id] = profile
+        self._index.move_to_end(profile.family_id)
+        while len(self._index) > self.cache_size:
+            self._index.popitem(last=False)
+    
+    def _get_cached(self, family_id: str) -> Optional[FamilyProfile]:
+        """Profile from the LRU, loading it from disk on a miss."""
+        profile = self._index.get(family_id)
+        if profile is not None:
+            self._index.move_to_end(family_id)
+            return profile
+        # Evicted before its snapshot was flushed; the disk copy is stale
+        profile = self._dirty.get(family_id) or self._flushing.get(family_id)
+        if profile is not None:
+            self._remember(profile)
+            return profile
+        profile = self._load_profile(family_id)
+        if profile is not None:
+            self._remember(profile)
+        return profile
+    
+    def _save_profile(self, profile: FamilyProfile) -> bool:
+        """Atomically write one family's snapshot (tmp file + os.replace); True on success."""
+        try:
+            path = self._profile_path(profile.family_id)
+            tmp_path = path.with_suffix(".json.tmp")
+            self.profiles_dir.mkdir(exist_ok=True)
+            # Serialized by pydantic-core in one pass, no dict round-trip
+            tmp_path.write_bytes(profile.model_dump_json(indent=2).encode())
+            os.replace(tmp_path, path)
+            logger.debug("Saved profile {}", profile.family_id)
+            return True
         except Exception as e:
-            logger.error(f"Error saving profiles index: {e}")
+            logger.error(f"Error saving profile {profile.family_id}: {e}")
+            return False
+    
+    def _schedule_save(self, profile: Optional[FamilyProfile] = None, chat_index: bool = False) -> None:
+        """Mark a logged mutation's state dirty and schedule compaction."""
+        if profile is not None:
+            self._dirty[profile.family_id] = profile
+        if chat_index:
+            self._chat_index_dirty = True
+        self._events_since_snapshot += 1
+        self._schedule_flush()
+    
+    def start(self) -> None:
+        """
+        Begin compacting: flush at exit, and snapshot whatever loading replayed.
+        
+        Call once the bot is up; construction (and importing this module)
+        only reads the data directory.
+        """
+        if self._dirty or self._chat_index_dirty or self._events_since_snapshot:
+            self._schedule_flush()
+        else:
+            self._register_exit_flush()
+    
+    def _register_exit_flush(self) -> None:
+        """Flush dirty snapshots at interpreter exit (registered once)."""
+        if not self._flush_at_exit:
+            self._flush_at_exit = True
+            # atexit runs last-registered first: flush (which truncates) before close
+            atexit.register(self.flush)
+    
+    def _schedule_flush(self) -> None:
+        """Compact soon on the running loop, or right away without one."""
+        self._register_exit_flush()
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts, tests): write through
+            self.flush()
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._compact_now = asyncio.Event()
+            self._flush_task = asyncio.create_task(self._flush_later())
+        if self._events_since_snapshot >= self.compact_every:
+            self._compact_now.set()
+    
+    async def _flush_later(self) -> None:
+        """Compact after the snapshot interval (or sooner if the log grows)."""
+        while True:
+            try:
+                await asyncio.wait_for(self._compact_now.wait(), self.snapshot_interval)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                # Cancelled at shutdown: write synchronously so nothing dirty is dropped
+                self.flush()
+                raise
+            self._compact_now.clear()
+            # No mutation can sit between its memory change and its log append
+            async with self._gate.compaction():
+                profiles, chat_index, events = self._take_dirty()
+                failed = await asyncio.to_thread(self._write_snapshots, profiles, chat_index, events)
+                self._finish_snapshots(*failed, events)
+            # Mutations made while the write was in flight didn't schedule a flush
+            if not self._dirty and not self._chat_index_dirty:
+                return
+    
+    def _take_dirty(self):
+        """Detach dirty state for writing (on the loop, so it's consistent)."""
+        self._flushing, self._dirty = self._dirty, {}
+        chat_index = dict(self._chat_to_family) if self._chat_index_dirty else None
+        self._chat_index_dirty = False
+        events = self._events_since_snapshot
+        self._events_since_snapshot = 0
+        return list(self._flushing.values()), chat_index, events
+    
+    def _write_snapshots(self, profiles: List[FamilyProfile], chat_index: Optional[Dict[int, str]],
+                         events: int = 0) -> Tuple[List[FamilyProfile], bool]:
+        """
+        Write detached snapshots, then drop the log they cover; thread-safe.
+        
+        The log is only truncated when every snapshot landed. Returns the
+        profiles that failed and whether the chat index failed.
+        """
+        failed = [profile for profile in profiles if not self._save_profile(profile)]
+        index_failed = chat_index is not None and not self._save_chat_index(chat_index)
+        if failed or index_failed:
+            logger.error(f"Snapshot write failed ({len(failed)} profile(s), "
+                         f"chat index={'failed' if index_failed else 'ok'}); keeping profiles log")
+        elif events:
+            self._log_fh.truncate(0)  # O_APPEND keeps later writes at the new end
+        if profiles:
+            logger.debug("Compacted {} profile snapshot(s)", len(profiles) - len(failed))
+        return failed, index_failed
+    
+    def _finish_snapshots(self, failed: List[FamilyProfile], index_failed: bool, events: int) -> None:
+        """Re-queue whatever didn't reach disk so the next compaction retries it."""
+        for profile in failed:
+            # A newer mutation made during the write wins
+            self._dirty.setdefault(profile.family_id, profile)
+        if index_failed:
+            self._chat_index_dirty = True
+        if failed or index_failed:
+            # The log wasn't truncated; its events still need a compaction
+            self._events_since_snapshot += events
+        self._flushing = {}
+    
+    def flush(self) -> None:
+        """Write all dirty snapshots and the chat index now, then truncate the log."""
+        profiles, chat_index, events = self._take_dirty()
+        self._finish_snapshots(*self._write_snapshots(profiles, chat_index, events), events)
+    
+    def _replay_log(self) -> None:
+        """Apply log events newer than the snapshots; start() compacts them."""
+        if not self.profiles_log_path.exists():
+            return
+        applied = 0
+        with open(self.profiles_log_path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    self._apply_event(orjson.loads(line))
+                    applied += 1
+                except Exception as e:
+                    logger.error(f"Skipping bad profiles log line: {e}")
+        if applied:
+            logger.info(f"Replayed {applied} profile event(s) from {self.profiles_log_path.name}")
+            self._events_since_snapshot = applied
+    
+    def _apply_event(self, event: Dict[str, Any]) -> None:
+        """Re-apply one logged mutation to in-memory state."""
+        kind = event.get('type')
+        if kind == 'UPSERT_PROFILE':
+            profile = FamilyProfile(**event['payload'])
+            for chat_id in profile.members:
+                self._chat_to_family[chat_id] = profile.family_id
+            self._chat_index_dirty = True
+        else:
+            profile = self._get_cached(event.get('family_id', ''))
+            if profile is None:
+                return  # Family never snapshotted or created; nothing to apply to
+            if kind == 'SET_FIELDS':
+                data = profile.model_dump()
+                data.update({k: v for k, v in event['payload'].items() if k in _FIELDS or k == 'children'})
+                profile = FamilyProfile(**data)
+            elif kind == 'ADD_MEMBER' and event['chat_id'] not in profile.members:
+                profile.members.append(event['chat_id'])
+                self._chat_to_family[event['chat_id']] = profile.family_id
+                self._chat_index_dirty = True
+            elif kind == 'REMOVE_MEMBER' and event['chat_id'] in profile.members:
+                profile.members.remove(event['chat_id'])
+                if self._chat_to_family.get(event['chat_id']) == profile.family_id:
+                    del self._chat_to_family[event['chat_id']]
+                self._chat_index_dirty = True
+            ts = event.get('ts')
+            if isinstance(ts, (int, float)):
+                profile.updated_at = datetime.fromtimestamp(ts)
+            elif ts:
+                profile.updated_at = datetime.fromisoformat(ts)  # logs written before epoch ts
+        self._remember(profile)
+        self._dirty[profile.family_id] = profile
+    
+    def _save_index(self) -> None:
+        """Save every loaded profile and the chat index (mutations use _save_profile)."""
+        for profile in self._index.values():
+            self._save_profile(profile)
+            for chat_id in profile.members:
+                self._chat_to_family[chat_id] = profile.family_id
+        self._save_chat_index()
+        logger.debug("Saved {} profiles", len(self._index))
     
     def _load_join_codes(self) -> None:
         """Load join codes from JSON file."""
@@ -143,6 +533,11 @@ class ProfilesStore:
             if self.join_codes_path.exists():
                 with open(self.join_codes_path, 'r', encoding='utf-8') as f:
                     self._join_codes = json.load(f)
+                for code, data in self._join_codes.items():
+                    if 'expires_epoch' not in data:
+                        data['expires_epoch'] = datetime.fromisoformat(data['expires_at']).timestamp()
+                    self._join_expiry.append((data['expires_epoch'], code))
+                heapq.heapify(self._join_expiry)
                 logger.info(f"Loaded {len(self._join_codes)} join codes")
             else:
                 logger.info("No join codes found, starting fresh")
@@ -150,66 +545,78 @@ class ProfilesStore:
             logger.error(f"Error loading join codes: {e}")
             self._join_codes = {}
     
-    def _save_join_codes(self) -> None:
-        """Save join codes to JSON file."""
+    def _save_join_codes(self, codes: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        """Save join codes (or a copy of them) to JSON file."""
+        codes = self._join_codes if codes is None else codes
         try:
-            with open(self.join_codes_path, 'w', encoding='utf-8') as f:
-                json.dump(self._join_codes, f, indent=2, default=str)
-            logger.debug(f"Saved {len(self._join_codes)} join codes")
+            self.join_codes_path.write_bytes(orjson.dumps(codes, option=orjson.OPT_INDENT_2))
+            logger.debug("Saved {} join codes", len(codes))
         except Exception as e:
             logger.error(f"Error saving join codes: {e}")
     
+    async def _save_join_codes_async(self) -> None:
+        """Save a copy of the join codes from a worker thread."""
+        await asyncio.to_thread(self._save_join_codes, dict(self._join_codes))
+    
+    async def _append_log_async(self, event: Dict[str, Any]) -> None:
+        """Append event to the JSONL log from a worker thread (one write call)."""
+        await asyncio.to_thread(self._append_log, event)
+    
     def _append_log(self, event: Dict[str, Any]) -> None:
         """Append event to JSONL log."""
         try:
-            event['ts'] = datetime.now().isoformat()
-            safe_event = _jsonl_safe(event)
-            with open(self.profiles_log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(safe_event) + '\n')
-            logger.debug(f"Appended event: {event['type']}")
+            # Epoch seconds; mutations pass the same ts they stamped on the profile
+            event.setdefault('ts', time.time())
+            # orjson encodes datetimes itself; models go through _json_default
+            line = orjson.dumps(event, default=_json_default, option=orjson.OPT_APPEND_NEWLINE)
+            self._log_fh.write(line)
+            logger.debug("Appended event: {}", event['type'])
         except Exception as e:
             logger.error(f"Error appending to log: {e}")
     
-    def _garbage_collect_join_codes(self) -> None:
-        """Remove expired join codes."""
-        now = datetime.now()
-        expired = []
-        for code, data in self._join_codes.items():
-            expires_at = datetime.fromisoformat(data['expires_at'])
-            if now > expires_at:
-                expired.append(code)
-        
-        for code in expired:
-            del self._join_codes[code]
+    def _garbage_collect_join_codes(self) -> int:
+        """Remove expired join codes; returns how many (caller persists)."""
+        now = time.time()
+        expired = 0
+        while self._join_expiry and self._join_expiry[0][0] <= now:
+            _, code = heapq.heappop(self._join_expiry)
+            data = self._join_codes.get(code)
+            if data is not None and data['expires_epoch'] <= now:
+                del self._join_codes[code]
+                expired += 1
         
         if expired:
-            logger.info(f"Garbage collected {len(expired)} expired join codes")
-            self._save_join_codes()
+            logger.info(f"Garbage collected {expired} expired join codes")
+        return expired
+    
+    def _find_by_chat(self, chat_id: int) -> Optional[FamilyProfile]:
+        """Find the profile a chat belongs to; caller holds the lock."""
+        family_id = self._chat_to_family.get(chat_id)
+        return self._get_cached(family_id) if family_id else None
+    
+    # Reads don't await between lookup and return, so they can't observe a
+    # half-applied mutation and don't need to queue behind the lock.
     
     async def get_profile_by_chat(self, chat_id: int) -> Optional[FamilyProfile]:
         """Get profile by chat ID (any member)."""
-        async with self._get_lock():
-            for profile in self._index.values():
-                if chat_id in profile.members:
-                    return profile
-            return None
+        return self._find_by_chat(chat_id)
     
     async def get_profile(self, family_id: str) -> Optional[FamilyProfile]:
         """Get profile by family ID."""
-        async with self._get_lock():
-            return self._index.get(family_id)
+        return self._get_cached(family_id)
     
     async def create_or_get(self, chat_id: int) -> FamilyProfile:
         """Create minimal profile stub or get existing."""
-        async with self._get_lock():
+        family_id = f"fam_{chat_id}"
+        async with self._mutating(family_id):
             # Check if user is already a member of any family
-            existing = await self.get_profile_by_chat(chat_id)
+            existing = self._find_by_chat(chat_id)
             if existing:
                 return existing
             
             # Create new family
-            family_id = f"fam_{chat_id}"
-            now = datetime.now()
+            ts = time.time()
+            now = datetime.fromtimestamp(ts)
             
             profile = FamilyProfile(
                 family_id=family_id,
@@ -220,13 +627,16 @@ class ProfilesStore:
                 updated_at=now
             )
             
-            self._index[family_id] = profile
-            self._save_index()
+            self._remember(profile)
+            self._chat_to_family[chat_id] = family_id
+            self._schedule_save(profile, chat_index=True)
+            self._notify(profile.members)
             
             # Log creation
-            self._append_log({
+            await self._append_log_async({
                 'type': 'UPSERT_PROFILE',
-                'payload': profile.dict()
+                'payload': profile.model_dump(mode="json"),
+                'ts': ts
             })
             
             logger.info(f"Created new family profile: {family_id}")
@@ -234,29 +644,31 @@ class ProfilesStore:
     
     async def upsert_fields(self, family_id: str, **fields) -> FamilyProfile:
         """Update profile fields."""
-        async with self._get_lock():
-            if family_id not in self._index:
+        async with self._mutating(family_id):
+            profile = self._get_cached(family_id)
+            if profile is None:
                 raise ValueError(f"Family {family_id} not found")
             
-            profile = self._index[family_id]
+            if "children" in fields:
+                fields.update(children_columns(fields.pop("children")))
             
-            # Update fields
-            for key, value in fields.items():
-                if hasattr(profile, key):
-                    setattr(profile, key, value)
-            
-            profile.updated_at = datetime.now()
-            self._index[family_id] = profile
-            self._save_index()
+            # Unknown keys are dropped; the store swaps in an updated copy
+            updates = {k: v for k, v in fields.items() if k in _FIELDS}
+            ts = time.time()
+            profile = profile.model_copy(update={**updates, 'updated_at': datetime.fromtimestamp(ts)})
+            self._remember(profile)
+            self._schedule_save(profile)
+            self._notify(profile.members)
             
             # Log update
-            self._append_log({
+            await self._append_log_async({
                 'type': 'SET_FIELDS',
                 'family_id': family_id,
-                'payload': fields
+                'payload': updates,
+                'ts': ts
             })
             
-            logger.info(f"Updated profile {family_id}: {list(fields.keys())}")
+            logger.info(f"Updated profile {family_id}: {list(updates.keys())}")
             return profile
     
     async def mark_complete(self, family_id: str, value: bool = True) -> FamilyProfile:
@@ -265,48 +677,58 @@ class ProfilesStore:
     
     async def add_member(self, family_id: str, chat_id: int) -> FamilyProfile:
         """Add member to family."""
-        async with self._get_lock():
-            if family_id not in self._index:
-                raise ValueError(f"Family {family_id} not found")
-            
-            profile = self._index[family_id]
+        async with self._mutating(family_id):
+            return await self._add_member(family_id, chat_id)
+    
+    async def _add_member(self, family_id: str, chat_id: int) -> FamilyProfile:
+        """Add member to family; caller holds the family's lock."""
+        profile = self._get_cached(family_id)
+        if profile is None:
+            raise ValueError(f"Family {family_id} not found")
+        
+        if chat_id not in profile.members:
+            profile.members.append(chat_id)
+            ts = time.time()
+            profile.updated_at = datetime.fromtimestamp(ts)
+            self._chat_to_family[chat_id] = family_id
+            self._schedule_save(profile, chat_index=True)
+            self._notify(profile.members)
             
-            if chat_id not in profile.members:
-                profile.members.append(chat_id)
-                profile.updated_at = datetime.now()
-                self._index[family_id] = profile
-                self._save_index()
-                
-                # Log addition
-                self._append_log({
-                    'type': 'ADD_MEMBER',
-                    'family_id': family_id,
-                    'chat_id': chat_id
-                })
-                
-                logger.info(f"Added member {chat_id} to family {family_id}")
+            # Log addition
+            await self._append_log_async({
+                'type': 'ADD_MEMBER',
+                'family_id': family_id,
+                'chat_id': chat_id,
+                'ts': ts
+            })
             
-            return profile
+            logger.info(f"Added member {chat_id} to family {family_id}")
+        
+        return profile
     
     async def remove_member(self, family_id: str, chat_id: int) -> FamilyProfile:
         """Remove member from family."""
-        async with self._get_lock():
-            if family_id not in self._index:
+        async with self._mutating(family_id):
+            profile = self._get_cached(family_id)
+            if profile is None:
                 raise ValueError(f"Family {family_id} not found")
             
-            profile = self._index[family_id]
-            
             if chat_id in profile.members:
                 profile.members.remove(chat_id)
-                profile.updated_at = datetime.now()
-                self._index[family_id] = profile
-                self._save_index()
+                ts = time.time()
+                profile.updated_at = datetime.fromtimestamp(ts)
+                indexed = self._chat_to_family.get(chat_id) == family_id
+                if indexed:
+                    del self._chat_to_family[chat_id]
+                self._schedule_save(profile, chat_index=indexed)
+                self._notify(profile.members + [chat_id])
                 
                 # Log removal
-                self._append_log({
+                await self._append_log_async({
                     'type': 'REMOVE_MEMBER',
                     'family_id': family_id,
-                    'chat_id': chat_id
+                    'chat_id': chat_id,
+                    'ts': ts
                 })
                 
                 logger.info(f"Removed member {chat_id} from family {family_id}")
@@ -315,50 +737,56 @@ class ProfilesStore:
     
     async def find_family_id_by_member(self, chat_id: int) -> Optional[str]:
         """Find family ID by member chat ID."""
-        profile = await self.get_profile_by_chat(chat_id)
-        return profile.family_id if profile else None
+        return self._chat_to_family.get(chat_id)
     
     async def generate_join_code(self, family_id: str) -> str:
         """Generate secure join code for family."""
-        async with self._get_lock():
-            if family_id not in self._index:
+        async with self._join_lock:
+            if self._get_cached(family_id) is None:
                 raise ValueError(f"Family {family_id} not found")
             
             # Generate 6-8 character code
             code = ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(6))
             
             # Set expiration (48 hours)
-            expires_at = datetime.now() + timedelta(hours=48)
+            now = datetime.now()
+            expires_at = now + timedelta(hours=48)
+            expires_epoch = expires_at.timestamp()
             
             self._join_codes[code] = {
                 'family_id': family_id,
-                'created_at': datetime.now().isoformat(),
-                'expires_at': expires_at.isoformat()
+                'created_at': now.isoformat(),
+                'expires_at': expires_at.isoformat(),
+                'expires_epoch': expires_epoch
             }
+            heapq.heappush(self._join_expiry, (expires_epoch, code))
             
-            self._save_join_codes()
+            await self._save_join_codes_async()
             
             logger.info(f"Generated join code {code} for family {family_id}")
             return code
     
     async def consume_join_code(self, code: str, chat_id: int) -> FamilyProfile:
         """Consume join code and add user to family."""
-        async with self._get_lock():
+        async with self._join_lock:
             # Garbage collect expired codes
-            self._garbage_collect_join_codes()
+            expired = self._garbage_collect_join_codes()
             
             if code not in self._join_codes:
+                if expired:
+                    await self._save_join_codes_async()
                 raise ValueError("Invalid or expired join code")
             
             code_data = self._join_codes[code]
             family_id = code_data['family_id']
             
             # Add member to family
-            profile = await self.add_member(family_id, chat_id)
+            async with self._mutating(family_id):
+                profile = await self._add_member(family_id, chat_id)
             
             # Remove used code
             del self._join_codes[code]
-            self._save_join_codes()
+            await self._save_join_codes_async()
             
             logger.info(f"Consumed join code {code} for chat {chat_id} -> family {family_id}")
             return profile
@@ -1,10 +1,13 @@
 # bot/puller.py
 import os
 import asyncio
-import json
+import orjson
+import random
 from datetime import datetime
+from typing import Dict, List, Optional
 from loguru import logger
 import aiohttp
+from aiogram.exceptions import TelegramRetryAfter
 
 from .models import EventRecord, PwaSessionReport
 from .storage import Storage
@@ -14,7 +17,12 @@ from .handlers import convert_pwa_to_bot_format  # reuse same converter
 RELAY_PULL_URL = os.getenv("RELAY_PULL_URL", "https://silli-auto-ingest-relay.silli-tg-bot.workers.dev/pull")
 RELAY_SECRET   = os.getenv("RELAY_SECRET")
 PULL_INTERVAL  = int(os.getenv("RELAY_PULL_INTERVAL_S", "15"))
+PULL_CONCURRENCY = int(os.getenv("RELAY_PULL_CONCURRENCY", "8"))  # chats pulled at once
+PULL_BATCH_SIZE = int(os.getenv("RELAY_PULL_BATCH", "50"))  # chats per /pull request
+TELEGRAM_MESSAGE_LIMIT = 4096
+PULL_MAX_BACKOFF_S = 300  # ceiling for the retry interval while the relay is failing
 ADMIN_CHAT_ID  = os.getenv("ADMIN_CHAT_ID")  # optional: notify on repeated failures
+TELEGRAM_SEND_RATE = float(os.getenv("TELEGRAM_SEND_RATE", "28"))  # msgs/s; Telegram caps bots near 30
 
 
 
@@ -25,24 +33,72 @@ async def pull_for_chat(sess: aiohttp.ClientSession, bot, chat_id: int, limit: i
     params = {"chat_id": str(chat_id), "limit": str(limit)}
     headers = {"X-Auth": RELAY_SECRET} if RELAY_SECRET else {}
     
-    async with sess.get(RELAY_PULL_URL, params=params, headers=headers, timeout=20) as r:
+    async with sess.get(RELAY_PULL_URL, params=params, headers=headers) as r:
         if r.status != 200:
             txt = await r.text()
             logger.warning(f"Relay pull failed for {chat_id}: {r.status} {txt}")
             return -1
-        data = await r.json()
+        data = orjson.loads(await r.read())  # parse the UTF-8 body directly
 
-    items = data.get("items", [])
+    return await ingest_items(bot, chat_id, data.get("items", []))
+
+async def pull_batch(sess: aiohttp.ClientSession, bot, chat_ids: List[int], limit: int = 5) -> Optional[Dict[int, int]]:
+    """
+    Pull pending sessions for several chats in one request (chat_ids=1,2,3).
+    
+    Returns ingested counts per chat (-1 on failure), or None if the relay
+    doesn't support batch pulls so the caller can fall back to per-chat pulls.
+    """
+    params = {"chat_ids": ",".join(str(c) for c in chat_ids), "limit": str(limit)}
+    headers = {"Accept": "application/x-ndjson, application/json"}
+    if RELAY_SECRET:
+        headers["X-Auth"] = RELAY_SECRET
+    
+    async with sess.get(RELAY_PULL_URL, params=params, headers=headers) as r:
+        if r.status == 400:
+            return None  # older relay: only understands chat_id
+        if r.status != 200:
+            txt = await r.text()
+            logger.warning(f"Relay batch pull failed for {len(chat_ids)} chat(s): {r.status} {txt}")
+            return {chat_id: -1 for chat_id in chat_ids}
+        if r.content_type == "application/x-ndjson":
+            # Parse item by item as chunks arrive instead of buffering the whole
+            # body; chunked reads don't cap line length the way readline does
+            items_by_chat = {}
+            pending = b""
+            async for chunk in r.content.iter_chunked(64 * 1024):
+                *lines, pending = (pending + chunk).split(b"\n")
+                for line in lines:
+                    _add_ndjson_item(items_by_chat, line)
+            _add_ndjson_item(items_by_chat, pending)
+        else:
+            items_by_chat = orjson.loads(await r.read()).get("items_by_chat") or {}
+
+    return {
+        chat_id: await ingest_items(bot, chat_id, items_by_chat.get(str(chat_id), []))
+        for chat_id in chat_ids
+    }
+
+def _add_ndjson_item(items_by_chat: Dict[str, list], line: bytes) -> None:
+    """File one NDJSON {chat_id, key, data} line under its chat."""
+    if line.strip():
+        item = orjson.loads(line)
+        items_by_chat.setdefault(str(item.pop("chat_id")), []).append(item)
+
+async def ingest_items(bot, chat_id: int, items: list) -> int:
+    """Store pulled session reports for a chat and confirm them in one message; returns how many were new."""
     count = 0
+    confirmations = []
     for item in items:
         report_raw = item.get("data") or {}
         try:
             converted = convert_pwa_to_bot_format(report_raw)
-            report = PwaSessionReport(**converted)
+            # The converter already fixes the shape; skip re-validating it here.
+            # The stored EventRecord below is still validated
+            report = PwaSessionReport.model_construct(**converted)
 
             # ---- Replay guard: skip if we already ingested this session ----
-            existing = storage.get_events(report.family_id)
-            if any(e.session_id == report.session_id and e.event == "ingest_session_report" for e in existing):
+            if storage.has_ingested(report.family_id, report.session_id):
                 logger.info(f"Skip duplicate session {report.session_id} for {report.family_id}")
                 continue
 
@@ -63,63 +119,149 @@ async def pull_for_chat(sess: aiohttp.ClientSession, bot, chat_id: int, limit: i
                 score=int(long_score) if isinstance(long_score, (int, float)) else None,
                 suggestion_id=None,
             )
-            storage.append_event(event)
+            storage.enqueue_event(event)
 
             # Enhanced session confirmation message
             short_id = report.session_id.split("_")[-1] if "_" in report.session_id else report.session_id[-8:]
             duration_min = int(report.duration_s // 60)
             duration_sec = int(report.duration_s % 60)
             
-            await bot.send_message(
-                chat_id=int(chat_id),
-                text=(
-                    f"✅ Session received: #{short_id}\n"
-                    f"⏱ {duration_min:02d}:{duration_sec:02d} min\n"
-                    f"Score: {long_score}/100\n"
-                    f"Badges: {', '.join(report.badges) if report.badges else '—'}\n"
-                    f"Use /list to view more."
-                ),
+            confirmations.append(
+                f"✅ Session received: #{short_id}\n"
+                f"⏱ {duration_min:02d}:{duration_sec:02d} min\n"
+                f"Score: {long_score}/100\n"
+                f"Badges: {', '.join(report.badges) if report.badges else '—'}"
             )
             count += 1
         except Exception as e:
             logger.error(f"Error processing pulled session for chat {chat_id}: {e}")
+
+    if confirmations:
+        confirmations[-1] += "\nUse /list to view more."
+        # One message per pull instead of one per session, split at Telegram's size limit
+        for text in _pack_messages(confirmations):
+            try:
+                await _send(bot, int(chat_id), text)
+            except Exception as e:
+                logger.error(f"Failed to confirm pulled sessions for chat {chat_id}: {e}")
     return count
 
+class _SendPacer:
+    """Spaces outbound sends to `rate` per second across all concurrent pulls."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        # Claim the next free slot; single-threaded loop, so no lock needed
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+_pacer = _SendPacer(TELEGRAM_SEND_RATE)
+
+async def _send(bot, chat_id: int, text: str) -> None:
+    """Paced send_message; waits out one flood-control response and retries."""
+    await _pacer.wait()
+    try:
+        await bot.send_message(chat_id=chat_id, text=text)
+    except TelegramRetryAfter as e:
+        logger.warning(f"Telegram flood control, retrying chat {chat_id} in {e.retry_after}s")
+        await asyncio.sleep(e.retry_after)
+        await _pacer.wait()
+        await bot.send_message(chat_id=chat_id, text=text)
+
+def _pack_messages(blocks: List[str], limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
+    """Join blocks with blank lines into as few messages as fit under the limit."""
+    messages, current = [], ""
+    for block in blocks:
+        if current and len(current) + 2 + len(block) > limit:
+            messages.append(current)
+            current = block
+        else:
+            current = f"{current}\n\n{block}" if current else block
+    if current:
+        messages.append(current)
+    return messages
+
+def _make_session() -> aiohttp.ClientSession:
+    """One pooled session for the whole loop, so relay connections are kept alive between pulls."""
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=60, ttl_dns_cache=300),
+        # sock_read fails a stalled response early instead of holding it to the total limit
+        timeout=aiohttp.ClientTimeout(total=20, sock_read=10),
+    )
+
+def _next_interval(interval: float, ingested: int, failed: bool) -> float:
+    """Poll at the base rate while sessions arrive; back off when idle or failing."""
+    if ingested:
+        return PULL_INTERVAL
+    if failed:
+        return min(interval * 2, PULL_MAX_BACKOFF_S)
+    return min(interval * 1.5, PULL_INTERVAL * 8)
+
 async def start_pull_loop(bot):
     logger.info("Starting relay pull loop…")
     consecutive_failures = 0
-    while True:
-        try:
-            roster = families.list()
-            if not roster:
-                await asyncio.sleep(PULL_INTERVAL)
-                continue
-
+    interval = PULL_INTERVAL
+    sem = asyncio.Semaphore(PULL_CONCURRENCY)
+    async with _make_session() as sess:
+        while True:
             total = 0
-            async with aiohttp.ClientSession() as sess:
-                for i, chat_id in enumerate(roster):
-                    n = await pull_for_chat(sess, bot, chat_id, limit=5)
+            failed = False
+            try:
+                roster = families.list()
+
+                # One request per batch of chats, overlapped; the semaphore caps
+                # load on the relay. Relays without batch mode get per-chat pulls
+                async def pull_one(chat_id):
+                    async with sem:
+                        return await pull_for_chat(sess, bot, chat_id, limit=5)
+
+                async def pull_chunk(chat_ids):
+                    try:
+                        async with sem:
+                            counts = await pull_batch(sess, bot, chat_ids, limit=5)
+                    except Exception as e:
+                        return [e] * len(chat_ids)  # logged per chat below
+                    if counts is None:
+                        return await asyncio.gather(*(pull_one(c) for c in chat_ids), return_exceptions=True)
+                    return [counts[c] for c in chat_ids]
+
+                chunks = [roster[i:i + PULL_BATCH_SIZE] for i in range(0, len(roster), PULL_BATCH_SIZE)]
+                results = [n for chunk in await asyncio.gather(*(pull_chunk(c) for c in chunks)) for n in chunk]
+
+                for chat_id, n in zip(roster, results):
+                    if isinstance(n, Exception):
+                        logger.error(f"Relay pull error for {chat_id}: {n}")
+                        n = -1
                     if n >= 0:
                         total += n
                         consecutive_failures = 0  # success resets failures
                     else:
                         consecutive_failures += 1
-                    # gentle spacing between chats
-                    await asyncio.sleep(0.75)
+                        failed = True
 
-            if total:
-                logger.info(f"Ingested {total} session(s) from relay")
+                if total:
+                    logger.info(f"Ingested {total} session(s) from relay")
 
-            # Escalate after repeated failures
-            if ADMIN_CHAT_ID and consecutive_failures >= 3:
-                try:
-                    await bot.send_message(int(ADMIN_CHAT_ID),
-                        f"⚠️ Relay pull is failing repeatedly (count={consecutive_failures}). Check Worker/KV/secret.")
-                except Exception as e:
-                    logger.error(f"Failed to notify admin: {e}")
+                # Escalate after repeated failures
+                if ADMIN_CHAT_ID and consecutive_failures >= 3:
+                    try:
+                        await bot.send_message(int(ADMIN_CHAT_ID),
+                            f"⚠️ Relay pull is failing repeatedly (count={consecutive_failures}). Check Worker/KV/secret.")
+                    except Exception as e:
+                        logger.error(f"Failed to notify admin: {e}")
 
-        except Exception as e:
-            logger.error(f"Pull loop error: {e}")
-            consecutive_failures += 1
+            except Exception as e:
+                logger.error(f"Pull loop error: {e}")
+                consecutive_failures += 1
+                failed = True
 
-        await asyncio.sleep(PULL_INTERVAL) 
\ No newline at end of file
+            interval = _next_interval(interval, total, failed)
+            # ±10% jitter so instances restarted together don't poll (or retry
+            # a recovering relay) in lockstep
+            await asyncio.sleep(interval * random.uniform(0.9, 1.1))
@@ -6,8 +6,11 @@ Provides async interface for bot to call local reasoning engine
 
 import aiohttp
 import asyncio
-import json
+import functools
+import orjson
 import os
+import re
+import time
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass
 
@@ -15,7 +18,7 @@ class ReasonerUnavailable(Exception):
     """Raised when the reasoner is unavailable or returns an error"""
     pass
 
-@dataclass
+@dataclass(frozen=True)
 class ReasonerConfig:
     """Configuration for reasoner client"""
     base_url: str
@@ -46,6 +49,11 @@ def clamp_metric_overrides(overrides: Dict[str, float]) -> Dict[str, float]:
     
     return clamped
 
+@functools.lru_cache(maxsize=8)
+def _word_cut(max_words: int) -> "re.Pattern[str]":
+    """Matches the first max_words words only when another word follows."""
+    return re.compile(rf"\s*(?:\S+\s+){{{max_words - 1}}}\S+(?=\s+\S)")
+
 def truncate_tips(tips: List[str], max_words: int = 25) -> List[str]:
     """
     Truncate tips to maximum word count
@@ -58,6 +66,7 @@ def truncate_tips(tips: List[str], max_words: int = 25) -> List[str]:
         List of truncated tips
     """
     truncated = []
+    cut = _word_cut(max_words)
     
     for tip in tips:
         if not tip or not isinstance(tip, str):
@@ -66,20 +75,23 @@ def truncate_tips(tips: List[str], max_words: int = 25) -> List[str]:
         # Skip whitespace-only strings
         if not tip.strip():
             continue
-            
-        words = tip.split()
-        if len(words) <= max_words:
+        
+        # One regex scan finds the cut point; short tips never match
+        match = cut.match(tip)
+        if match is None:
             truncated.append(tip)
         else:
             # Truncate to max_words and add ellipsis
-            truncated_tip = " ".join(words[:max_words]) + "..."
-            truncated.append(truncated_tip)
+            truncated.append(tip[:match.end()].strip() + "...")
     
     return truncated
 
 class ReasonClient:
     """Lightweight HTTP client for Silli Reasoner"""
     
+    CIRCUIT_FAILURES = 3
+    CIRCUIT_COOLDOWN_S = 30.0
+    
     def __init__(self, base_url: str, timeout_s: int = 8):
         """
         Initialize reasoner client
@@ -91,6 +103,23 @@ class ReasonClient:
         self.base_url = base_url.rstrip('/')
         self.timeout_s = timeout_s
         self.session: Optional[aiohttp.ClientSession] = None
+        # Circuit breaker: after CIRCUIT_FAILURES straight failures, calls fail
+        # fast for CIRCUIT_COOLDOWN_S instead of waiting out the timeout
+        self._failures = 0
+        self._open_until = 0.0
+    
+    def _circuit_open(self) -> bool:
+        """True while recent failures say the reasoner is down"""
+        return self._failures >= self.CIRCUIT_FAILURES and time.monotonic() < self._open_until
+    
+    def _record_success(self) -> None:
+        self._failures = 0
+        self._open_until = 0.0
+    
+    def _record_failure(self) -> None:
+        self._failures += 1
+        if self._failures >= self.CIRCUIT_FAILURES:
+            self._open_until = time.monotonic() + self.CIRCUIT_COOLDOWN_S
     
     async def __aenter__(self):
         """Async context manager entry"""
@@ -136,18 +165,32 @@ class ReasonClient:
             Response from reasoner with tips, rationale, etc.
             
         Raises:
-            ReasonerUnavailable: If reasoner is unavailable or returns error
+            ReasonerUnavailable: If reasoner is unavailable, returns error, or
+                the circuit breaker is open
         """
         if not self.session:
             raise ReasonerUnavailable("Client session not initialized. Use async context manager.")
+        if self._circuit_open():
+            raise ReasonerUnavailable("Reasoner circuit open after repeated failures")
         
+        try:
+            response = await self._post_reason(payload)
+        except ReasonerUnavailable:
+            self._record_failure()
+            raise
+        self._record_success()
+        return response
+    
+    async def _post_reason(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST one inference request; errors surface as ReasonerUnavailable"""
         try:
             url = f"{self.base_url}/v1/reason"
             headers = {"Content-Type": "application/json"}
             
+            # orjson encodes (numpy scalars included) and decodes instead of aiohttp's stdlib json
             async with self.session.post(
                 url, 
-                json=payload, 
+                data=orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY), 
                 headers=headers
             ) as response:
                 
@@ -157,13 +200,13 @@ class ReasonClient:
                         f"Reasoner returned {response.status}: {error_text}"
                     )
                 
-                return await response.json()
+                return orjson.loads(await response.read())
                 
         except asyncio.TimeoutError:
             raise ReasonerUnavailable(f"Request timed out after {self.timeout_s}s")
         except aiohttp.ClientError as e:
             raise ReasonerUnavailable(f"Network error: {e}")
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             raise ReasonerUnavailable(f"Invalid JSON response: {e}")
         except Exception as e:
             raise ReasonerUnavailable(f"Unexpected error: {e}")
@@ -185,12 +228,13 @@ class ReasonClient:
             async with self.session.get(f"{self.base_url}/models") as response:
                 if response.status != 200:
                     raise ReasonerUnavailable(f"Failed to get models: {response.status}")
-                return await response.json()
+                return orjson.loads(await response.read())
         except Exception as e:
             raise ReasonerUnavailable(f"Failed to get models: {e}")
 
+@functools.lru_cache(maxsize=1)
 def create_reasoner_config() -> ReasonerConfig:
-    """Create reasoner configuration from environment variables"""
+    """Create reasoner configuration from environment variables (read once, shared)"""
     return ReasonerConfig(
         base_url=os.getenv('REASONER_BASE_URL', 'http://localhost:5001'),
         enabled=bool(os.getenv('REASONER_ENABLED', '0').lower() in ('1', 'true', 'yes', 'on')),
@@ -199,6 +243,45 @@ def create_reasoner_config() -> ReasonerConfig:
         temperature=float(os.getenv('REASONER_TEMP', '0.2'))
     )
 
+# Process-wide client whose pooled session is reused across reasoner calls
+_shared_client: Optional[ReasonClient] = None
+_shared_loop: Optional[asyncio.AbstractEventLoop] = None
+
+async def get_shared_client(config: ReasonerConfig) -> ReasonClient:
+    """
+    Return the shared reasoner client, opening its session on first use
+    
+    Keeps connections to the reasoner alive between calls instead of paying
+    a new connection (and DNS lookup) per inference. A config with a
+    different base_url or timeout, or a different event loop (the sync
+    wrapper runs its own), replaces the client.
+    """
+    global _shared_client, _shared_loop
+    client = _shared_client
+    loop = asyncio.get_running_loop()
+    if (client is None or client.session is None or client.session.closed or _shared_loop is not loop
+            or client.base_url != config.base_url.rstrip('/') or client.timeout_s != config.timeout_s):
+        if client is not None and _shared_loop is loop:
+            await client.__aexit__(None, None, None)
+        client = ReasonClient(config.base_url, config.timeout_s)
+        client.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=10, keepalive_timeout=30),
+            timeout=aiohttp.ClientTimeout(total=config.timeout_s)
+        )
+        _shared_client, _shared_loop = client, loop
+    return client
+
+async def close_shared_client() -> None:
+    """Close the shared client's session (called on bot shutdown)"""
+    global _shared_client, _shared_loop
+    if _shared_client is not None and _shared_loop is asyncio.get_running_loop():
+        await _shared_client.__aexit__(None, None, None)
+    _shared_client = _shared_loop = None
+
+def reset_config_cache() -> None:
+    """Re-read reasoner settings from the environment on the next create_reasoner_config()"""
+    create_reasoner_config.cache_clear()
+
 async def get_reasoning_insights(
     dyad: str,
     features: Dict[str, Any],
@@ -225,23 +308,25 @@ async def get_reasoning_insights(
         return None
     
     try:
-        async with ReasonClient(config.base_url, config.timeout_s) as client:
-            # Check health first
+        client = await get_shared_client(config)
+        # Only probe health while the breaker is open; a healthy probe closes it
+        if client._circuit_open():
             if not await client.health_check():
                 return None
-            
-            # Prepare payload
-            payload = {
-                "dyad": dyad,
-                "features": features,
-                "context": context,
-                "metrics": metrics,
-                "history": history
-            }
-            
-            # Get reasoning
-            response = await client.infer(payload)
-            return response
+            client._record_success()
+        
+        # Prepare payload
+        payload = {
+            "dyad": dyad,
+            "features": features,
+            "context": context,
+            "metrics": metrics,
+            "history": history
+        }
+        
+        # Get reasoning
+        response = await client.infer(payload)
+        return response
             
     except ReasonerUnavailable:
         # Log error but don't fail the main flow
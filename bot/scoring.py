@@ -3,104 +3,125 @@ Wind-Down scoring system for audio analysis.
 Rule-based scoring with configurable weights and badge/tip mapping.
 """
 
+import functools
 import json
 import os
-from typing import List, Tuple, Dict, Any
+from types import MappingProxyType
+import numpy as np
+from typing import List, Tuple, Dict, Any, Mapping
 from loguru import logger
 from .models import FeatureSummary
 
 
+_DEFAULT_WEIGHTS: Mapping[str, float] = MappingProxyType({
+    "w1_vad": 35.0,
+    "w2_flux": 25.0,
+    "w3_centroid": 20.0,
+    "w4_level": 20.0,
+    "w5_steady_bonus": 15.0
+})
+
+_DEFAULT_TIPS: Mapping[str, str] = MappingProxyType({
+    "quiet_minute": "Quiet minute + 4-7-8 breathing; speak softer than a whisper.",
+    "dim_lights": "Dim lights to warm (~1800K); hide bright screens.",
+    "white_noise": "Use gentle white noise; keep level below conversation loudness.",
+    "lullaby_pacing": "Lullaby pacing ~60–70 BPM; mirror child, then fade."
+})
+
+
+@functools.cache
+def _load_weights(weights_file: str) -> Mapping[str, float]:
+    """Load scoring weights from file or use defaults (read once per file)."""
+    try:
+        if os.path.exists(weights_file):
+            with open(weights_file, 'r') as f:
+                weights = json.load(f)
+            logger.info(f"Loaded weights from {weights_file}")
+            return MappingProxyType(weights)
+        logger.info("Weights file not found, using defaults")
+    except Exception as e:
+        logger.error(f"Error loading weights: {e}")
+    return _DEFAULT_WEIGHTS
+
+
+@functools.cache
+def _load_tips(tips_file: str = "tips.json") -> Mapping[str, str]:
+    """Load tips from file or use defaults (read once per file)."""
+    try:
+        if os.path.exists(tips_file):
+            with open(tips_file, 'r') as f:
+                tips = json.load(f)
+            logger.info(f"Loaded tips from {tips_file}")
+            return MappingProxyType(tips)
+        logger.info("Tips file not found, using defaults")
+    except Exception as e:
+        logger.error(f"Error loading tips: {e}")
+    return _DEFAULT_TIPS
+
+
 class WindDownScorer:
     """Rule-based scorer for Wind-Down analysis."""
     
     def __init__(self, weights_file: str = "weights.json"):
         self.weights_file = weights_file
-        self.weights = self._load_weights()
-        self.tips = self._load_tips()
+        # Read-only views shared across instances
+        self.weights = _load_weights(weights_file)
+        self.tips = _load_tips()
+        # Older weight files name it w5_steady_bonus
+        self.steady_bonus = self.weights.get("steady_bonus", self.weights.get("w5_steady_bonus", 0.0))
     
-    def _load_weights(self) -> Dict[str, float]:
-        """Load scoring weights from file or use defaults."""
-        try:
-            if os.path.exists(self.weights_file):
-                with open(self.weights_file, 'r') as f:
-                    weights = json.load(f)
-                logger.info(f"Loaded weights from {self.weights_file}")
-                return weights
-            else:
-                # Default weights
-                weights = {
-                    "w1_vad": 35.0,
-                    "w2_flux": 25.0,
-                    "w3_centroid": 20.0,
-                    "w4_level": 20.0,
-                    "w5_steady_bonus": 15.0
-                }
-                logger.info("Weights file not found, using defaults")
-                return weights
-        except Exception as e:
-            logger.error(f"Error loading weights: {e}")
-            return {
-                "w1_vad": 35.0,
-                "w2_flux": 25.0,
-                "w3_centroid": 20.0,
-                "w4_level": 20.0,
-                "w5_steady_bonus": 15.0
-            }
+    @classmethod
+    def reload(cls) -> None:
+        """Drop cached weights and tips so the next scorer re-reads the files."""
+        _load_weights.cache_clear()
+        _load_tips.cache_clear()
     
-    def _load_tips(self) -> Dict[str, str]:
-        """Load tips from file or use defaults."""
-        try:
-            tips_file = "tips.json"
-            if os.path.exists(tips_file):
-                with open(tips_file, 'r') as f:
-                    tips = json.load(f)
-                logger.info(f"Loaded tips from {tips_file}")
-                return tips
-            else:
-                # Default tips
-                tips = {
-                    "quiet_minute": "Quiet minute + 4-7-8 breathing; speak softer than a whisper.",
-                    "dim_lights": "Dim lights to warm (~1800K); hide bright screens.",
-                    "white_noise": "Use gentle white noise; keep level below conversation loudness.",
-                    "lullaby_pacing": "Lullaby pacing ~60–70 BPM; mirror child, then fade."
-                }
-                logger.info("Tips file not found, using defaults")
-                return tips
-        except Exception as e:
-            logger.error(f"Error loading tips: {e}")
-            return {
-                "quiet_minute": "Quiet minute + 4-7-8 breathing; speak softer than a whisper.",
-                "dim_lights": "Dim lights to warm (~1800K); hide bright screens.",
-                "white_noise": "Use gentle white noise; keep level below conversation loudness.",
-                "lullaby_pacing": "Lullaby pacing ~60–70 BPM; mirror child, then fade."
-            }
+    def calculate_scores_batch(self, vad_fraction, flux_norm, centroid_norm, level_dbfs) -> np.ndarray:
+        """Calculate Wind-Down Scores (0-100) for parallel 1-D feature arrays in one pass."""
+        vad = np.asarray(vad_fraction, dtype=np.float64)
+        flux = np.asarray(flux_norm, dtype=np.float64)
+        centroid = np.asarray(centroid_norm, dtype=np.float64)
+        level = np.asarray(level_dbfs, dtype=np.float64)
+        
+        # Normalize level_dbfs to 0-1 range
+        norm_level = np.clip((level + 60) / 60, 0, 1)
+        
+        # Steady noise bonus
+        steady_bonus = np.where((flux < 0.12) & (level >= -40) & (level <= -25), self.steady_bonus, 0.0)
+        
+        score = (100
+                 - self.weights["w1_vad"] * vad
+                 - self.weights["w2_flux"] * flux
+                 - self.weights["w3_centroid"] * centroid
+                 - self.weights["w4_level"] * norm_level
+                 + steady_bonus)
+        
+        # Clamp to 0-100
+        return np.clip(score, 0, 100).astype(np.int16)
     
     def calculate_score(self, features: FeatureSummary) -> int:
         """Calculate Wind-Down Score (0-100)."""
         try:
-            # Normalize level_dbfs to 0-1 range
-            norm_level = max(0, min(1, (features.level_dbfs + 60) / 60))
-            
-            # Calculate steady noise bonus
-            steady_bonus = 0
-            if (features.flux_norm < 0.12 and 
-                -40 <= features.level_dbfs <= -25):
-                steady_bonus = self.weights["steady_bonus"]
-            
-            # Calculate score
-            score = 100
-            score -= self.weights["w1_vad"] * features.vad_fraction
-            score -= self.weights["w2_flux"] * features.flux_norm
-            score -= self.weights["w3_centroid"] * features.centroid_norm
-            score -= self.weights["w4_level"] * norm_level
-            score += steady_bonus
+            # Plain comparisons rather than min/max calls or a NumPy round trip;
+            # must stay in step with calculate_scores_batch
+            w = self.weights
+            level = features.level_dbfs
+            norm_level = 0.0 if level <= -60 else (1.0 if level >= 0 else (level + 60) / 60)
+            steady_bonus = self.steady_bonus if features.flux_norm < 0.12 and -40 <= level <= -25 else 0.0
+            
+            score = (100
+                     - w["w1_vad"] * features.vad_fraction
+                     - w["w2_flux"] * features.flux_norm
+                     - w["w3_centroid"] * features.centroid_norm
+                     - w["w4_level"] * norm_level
+                     + steady_bonus)
             
             # Clamp to 0-100
-            score = max(0, min(100, int(score)))
+            score = 0 if score < 0 else (100 if score > 100 else int(score))
             
             logger.info(f"Calculated score: {score} (vad={features.vad_fraction:.2f}, "
                        f"flux={features.flux_norm:.2f}, centroid={features.centroid_norm:.2f}, "
-                       f"level={norm_level:.2f}, bonus={steady_bonus})")
+                       f"level_dbfs={features.level_dbfs:.1f})")
             
             return score
             
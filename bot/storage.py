@@ -2,14 +2,45 @@
 Storage module for Silli Bot - JSONL append and CSV roll-up
 """
 
-import json
+import asyncio
+import os
+import orjson
+import shutil
+import threading
 import csv
-from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from loguru import logger
 from .models import EventRecord, SessionRecord
 
+INGEST_EVENT = "ingest_session_report"
+
+# events file -> family_id -> ingested session ids; shared by every Storage
+# on the same file so the replay guard sees ingests from any module
+_INGESTED: Dict[Path, Dict[str, Set[str]]] = {}
+
+# Column order of sessions.csv
+SESSIONS_FIELDNAMES = (
+    "family_id", "session_id", "date", "phase", "start_ts", "end_ts",
+    "time_to_calm_min", "adoption_rate", "helpfulness_1to7", "privacy_1to7", "notes"
+)
+
+# Open shard descriptors kept per Storage before the least recent is closed
+SHARD_FDS_MAX = 64
+
+
+def _open_append(path: Path) -> int:
+    """Open a file for appending; every os.write lands at the current end."""
+    return os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    """os.write the whole buffer; a single call unless the kernel writes short."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
 
 class Storage:
     """Storage manager for events and sessions."""
@@ -17,46 +48,288 @@ class Storage:
     def __init__(self, data_dir: Path = Path("data")):
         self.data_dir = data_dir
         self.events_file = data_dir / "events.jsonl"
+        # Per-family copies of events.jsonl so reads scale with the family.
+        # events.jsonl is the source of truth: the shards are derived from it
+        # and rebuilt at startup when they fall out of step (deleting the
+        # directory forces the same rebuild)
+        self.events_dir = data_dir / "events"
+        self.shards_marker = self.events_dir / ".built"
         self.sessions_file = data_dir / "sessions.csv"
         
+        # Queue drained by run_writer(); None until the writer task starts
+        self._queue: Optional[asyncio.Queue] = None
+        
+        # O_APPEND descriptors kept open across writes; opened on first use.
+        # Shard descriptors are capped so many families can't exhaust fds
+        self._fd: Optional[int] = None
+        self._shard_fds: "OrderedDict[str, int]" = OrderedDict()
+        self._fp_lock = threading.Lock()
+        
         # Ensure data directory exists
         self.data_dir.mkdir(exist_ok=True)
         
         # Initialize sessions CSV if it doesn't exist
         if not self.sessions_file.exists():
             self._init_sessions_csv()
+        
+        if not self._shards_in_step():
+            self._build_shards()
+        
+        self._ingested_key = self.events_file.resolve()
+        if self._ingested_key not in _INGESTED:
+            _INGESTED[self._ingested_key] = self._load_ingested()
+    
+    def _load_ingested(self) -> Dict[str, Set[str]]:
+        """Index ingested session ids per family from the events file."""
+        index: Dict[str, Set[str]] = {}
+        marker = INGEST_EVENT.encode()
+        try:
+            with open(self.events_file, 'rb') as f:
+                for line in f:
+                    if marker not in line:
+                        continue
+                    try:
+                        event = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        continue
+                    if event.get('event') == INGEST_EVENT and event.get('session_id'):
+                        index.setdefault(event['family_id'], set()).add(event['session_id'])
+        except FileNotFoundError:
+            pass
+        return index
+    
+    def _shards_in_step(self) -> bool:
+        """
+        Whether the shards hold everything appended to events.jsonl.
+        
+        _write appends each batch to events.jsonl and then to the shards, so
+        both grow by the same bytes; a crash or failed write between the two
+        shows up as a difference in growth since the shards were built.
+        """
+        try:
+            built = orjson.loads(self.shards_marker.read_bytes())
+            source_size = self.events_file.stat().st_size if self.events_file.exists() else 0
+            shards_size = sum(
+                entry.stat().st_size for entry in os.scandir(self.events_dir)
+                if entry.name.endswith(".jsonl")
+            )
+        except (OSError, orjson.JSONDecodeError):
+            return False  # no shards yet, or built before sizes were recorded
+        if source_size - built["source"] == shards_size - built["shards"]:
+            return True
+        logger.warning("Event shards are out of step with events.jsonl; rebuilding")
+        return False
+    
+    def _build_shards(self) -> None:
+        """Split events.jsonl into per-family shards, replacing any existing set."""
+        shards: Dict[str, List[bytes]] = {}
+        source_size = shards_size = 0
+        try:
+            with open(self.events_file, 'rb') as f:
+                for line in f:
+                    source_size += len(line)
+                    if not line.strip():
+                        continue
+                    try:
+                        family_id = orjson.loads(line).get('family_id')
+                    except orjson.JSONDecodeError:
+                        continue
+                    if family_id:
+                        line = line if line.endswith(b"\n") else line + b"\n"
+                        shards.setdefault(family_id, []).append(line)
+                        shards_size += len(line)
+        except FileNotFoundError:
+            pass
+        
+        # Build beside the target and rename so a crash never leaves half a set
+        tmp_dir = self.data_dir / "events.tmp"
+        stale_dir = self.data_dir / "events.stale"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        shutil.rmtree(stale_dir, ignore_errors=True)
+        tmp_dir.mkdir()
+        for family_id, lines in shards.items():
+            with open(tmp_dir / f"{family_id}.jsonl", 'wb') as f:
+                f.writelines(lines)
+        # Sizes covered by this build, for _shards_in_step on later starts
+        (tmp_dir / self.shards_marker.name).write_bytes(
+            orjson.dumps({"source": source_size, "shards": shards_size})
+        )
+        try:
+            if self.events_dir.exists():
+                os.replace(self.events_dir, stale_dir)
+            os.replace(tmp_dir, self.events_dir)
+        except OSError:
+            # Another process got there first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        shutil.rmtree(stale_dir, ignore_errors=True)
+        if shards:
+            logger.info(f"Built event shards for {len(shards)} family(ies)")
+    
+    def _shard_path(self, family_id: str) -> Path:
+        """Path of a family's event shard."""
+        return self.events_dir / f"{family_id}.jsonl"
+    
+    def _note_event(self, event: EventRecord) -> None:
+        """Keep the ingested-session index in step with appended events."""
+        if event.event == INGEST_EVENT and event.session_id:
+            _INGESTED[self._ingested_key].setdefault(event.family_id, set()).add(event.session_id)
+    
+    def ingested(self, family_id: str) -> Set[str]:
+        """Session ids already ingested for a family (replay guard)."""
+        return _INGESTED[self._ingested_key].get(family_id, set())
+    
+    def has_ingested(self, family_id: str, session_id: str) -> bool:
+        """Whether a session report was already ingested for the family."""
+        sessions = _INGESTED[self._ingested_key].get(family_id)
+        return sessions is not None and session_id in sessions
     
     def _init_sessions_csv(self):
         """Initialize sessions CSV with headers."""
-        headers = [
-            "family_id", "session_id", "date", "phase", "start_ts", "end_ts",
-            "time_to_calm_min", "adoption_rate", "helpfulness_1to7", "privacy_1to7", "notes"
-        ]
-        
         with open(self.sessions_file, 'w', newline='') as f:
             writer = csv.writer(f)
-            writer.writerow(headers)
+            writer.writerow(SESSIONS_FIELDNAMES)
         
         logger.info(f"Initialized sessions CSV: {self.sessions_file}")
     
+    @staticmethod
+    def _serialize_event(event: EventRecord) -> bytes:
+        """Serialize event to a single JSONL line (datetimes as ISO 8601)."""
+        return orjson.dumps(
+            event.model_dump(),
+            option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS
+        )
+    
+    def _write(self, lines: Iterable[Tuple[str, bytes]]) -> None:
+        """
+        Append pre-serialized (family_id, line) pairs to events.jsonl and to
+        each family's shard, one write per file.
+        
+        The files aren't updated atomically together; if the process dies or
+        a shard write fails in between, the next Storage start rebuilds the
+        shards from events.jsonl.
+        """
+        ordered: List[bytes] = []
+        by_family: Dict[str, List[bytes]] = {}
+        for family_id, line in lines:
+            ordered.append(line)
+            by_family.setdefault(family_id, []).append(line)
+        with self._fp_lock:
+            try:
+                if self._fd is None:
+                    self._fd = _open_append(self.events_file)
+                # One syscall per batch; O_APPEND keeps lines from other
+                # processes and instances from interleaving
+                _write_all(self._fd, b"".join(ordered))
+                for family_id, family_lines in by_family.items():
+                    _write_all(self._shard_fd(family_id), b"".join(family_lines))
+            except Exception:
+                # Reopen on the next write rather than reuse a broken descriptor
+                self._close_file()
+                raise
+    
+    def _shard_fd(self, family_id: str) -> int:
+        """Descriptor for a family's shard (caller holds _fp_lock)."""
+        fd = self._shard_fds.get(family_id)
+        if fd is not None:
+            self._shard_fds.move_to_end(family_id)
+            return fd
+        if len(self._shard_fds) >= SHARD_FDS_MAX:
+            os.close(self._shard_fds.popitem(last=False)[1])
+        fd = self._shard_fds[family_id] = _open_append(self._shard_path(family_id))
+        return fd
+    
+    def _close_file(self) -> None:
+        """Close the append descriptors (caller holds _fp_lock)."""
+        fds = list(self._shard_fds.values())
+        if self._fd is not None:
+            fds.append(self._fd)
+        for fd in fds:
+            try:
+                os.close(fd)
+            except OSError as e:
+                logger.error(f"Failed to close events file: {e}")
+        self._fd = None
+        self._shard_fds.clear()
+    
+    def close(self) -> None:
+        """Close the events file descriptors."""
+        with self._fp_lock:
+            self._close_file()
+    
     def append_event(self, event: EventRecord) -> None:
         """Append event to JSONL file with safe writing."""
         try:
-            # Convert to dict and handle datetime serialization
-            event_dict = event.model_dump()
-            event_dict['ts'] = event_dict['ts'].isoformat()
-            
-            # Append to JSONL file
-            with open(self.events_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(event_dict) + '\n')
-                f.flush()  # Ensure immediate write
-            
+            self._write([(event.family_id, self._serialize_event(event))])
+            self._note_event(event)
             logger.info(f"Appended event: {event.event} for family {event.family_id}")
             
         except Exception as e:
             logger.error(f"Failed to append event: {e}")
             raise
     
+    def append_events(self, events: List[EventRecord]) -> None:
+        """Append a batch of events with a single open, write and flush."""
+        try:
+            self._write([(event.family_id, self._serialize_event(event)) for event in events])
+            for event in events:
+                self._note_event(event)
+            logger.info(f"Appended {len(events)} event(s)")
+            
+        except Exception as e:
+            logger.error(f"Failed to append {len(events)} event(s): {e}")
+            raise
+    
+    def enqueue_event(self, event: EventRecord) -> None:
+        """
+        Hand event to the background writer; writes inline if it isn't running.
+        
+        The event is serialized here so later mutations by the caller don't
+        leak into the queued line.
+        """
+        line = (event.family_id, self._serialize_event(event))
+        self._note_event(event)
+        if self._queue is None:
+            self._write([line])
+            logger.info(f"Appended event: {event.event} for family {event.family_id}")
+            return
+        self._queue.put_nowait(line)
+    
+    async def run_writer(self, max_batch: int = 512) -> None:
+        """Drain queued events in batches so handlers never wait on file I/O."""
+        self._queue = asyncio.Queue()
+        write = None
+        logger.info("Starting event writer…")
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                while not self._queue.empty() and len(batch) < max_batch:
+                    batch.append(self._queue.get_nowait())
+                # Write off the event loop; shielded so a cancel can't cut a batch in half
+                write = asyncio.ensure_future(asyncio.to_thread(self._write, batch))
+                try:
+                    await asyncio.shield(write)
+                    logger.debug("Event writer flushed {} event(s)", len(batch))
+                except Exception as e:
+                    # Keep draining so one failed write doesn't stall logging
+                    logger.error(f"Failed to write {len(batch)} queued event(s): {e}")
+        finally:
+            # Let an in-flight batch land first so lines stay in order
+            if write is not None and not write.done():
+                await asyncio.wait([write])
+                if write.exception() is not None:
+                    logger.error(f"Failed to write in-flight events at shutdown: {write.exception()}")
+            # Flush whatever is still queued before falling back to inline writes
+            queue, self._queue = self._queue, None
+            pending = []
+            while not queue.empty():
+                pending.append(queue.get_nowait())
+            if pending:
+                try:
+                    self._write(pending)
+                except Exception as e:
+                    logger.error(f"Failed to write {len(pending)} queued event(s) at shutdown: {e}")
+            self.close()
+    
     def rollup_session(self, session_record: SessionRecord) -> None:
         """Roll up session data to CSV (stub implementation)."""
         try:
@@ -69,10 +342,9 @@ class Storage:
             if session_dict.get('end_ts'):
                 session_dict['end_ts'] = session_dict['end_ts'].isoformat()
             
-            # Append to CSV
+            # Append to CSV in header order
             with open(self.sessions_file, 'a', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=session_dict.keys())
-                writer.writerow(session_dict)
+                csv.writer(f).writerow([session_dict.get(k) for k in SESSIONS_FIELDNAMES])
             
             logger.info(f"Rolled up session: {session_record.session_id}")
             
@@ -91,28 +363,57 @@ class Storage:
     def get_events_count(self) -> int:
         """Get count of events in JSONL file."""
         try:
-            with open(self.events_file, 'r', encoding='utf-8') as f:
-                return sum(1 for _ in f)
+            # Count newlines in large raw chunks instead of decoding every line
+            count, last = 0, b"\n"
+            with open(self.events_file, 'rb', buffering=0) as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    count += chunk.count(b"\n")
+                    last = chunk[-1:]
+            # A last line without its newline still counts
+            return count + (last != b"\n")
         except FileNotFoundError:
             return 0
     
     def get_events(self, family_id: str) -> list[EventRecord]:
         """Get all events for a specific family."""
-        events = []
         try:
-            with open(self.events_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if line.strip():
-                        event_dict = json.loads(line)
-                        # Convert ISO string back to datetime
-                        if 'ts' in event_dict:
-                            event_dict['ts'] = datetime.fromisoformat(event_dict['ts'])
-                        event = EventRecord(**event_dict)
-                        if event.family_id == family_id:
-                            events.append(event)
+            # One read for the whole shard, then split in C
+            data = self._shard_path(family_id).read_bytes()
+            return [EventRecord(**orjson.loads(line)) for line in data.split(b"\n") if line.strip()]
         except FileNotFoundError:
             logger.info(f"No events file found for family {family_id}")
         except Exception as e:
             logger.error(f"Error reading events for family {family_id}: {e}")
         
-        return events 
\ No newline at end of file
+        return []
+    
+    def get_recent_events(self, family_id: str, limit: int) -> list[EventRecord]:
+        """Get a family's last `limit` events, oldest first, reading the shard from the end."""
+        if limit <= 0:
+            return []
+        try:
+            lines = _tail_lines(self._shard_path(family_id), limit)
+            return [EventRecord(**orjson.loads(line)) for line in lines]
+        except FileNotFoundError:
+            logger.info(f"No events file found for family {family_id}")
+        except Exception as e:
+            logger.error(f"Error reading recent events for family {family_id}: {e}")
+        
+        return []
+
+
+def _tail_lines(path: Path, limit: int, block_size: int = 64 * 1024) -> List[bytes]:
+    """Return the last `limit` non-empty lines of a file, reading blocks backwards."""
+    with open(path, 'rb') as f:
+        pos = f.seek(0, os.SEEK_END)
+        data = b""
+        # One extra newline guarantees the oldest kept line is complete
+        while pos > 0 and data.count(b"\n") <= limit:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = data.split(b"\n")
+    if pos > 0:
+        lines = lines[1:]
+    return [line for line in lines if line.strip()][-limit:]
@@ -3,42 +3,74 @@ Webhook endpoint for secure PWA communication
 """
 
 import os
-import json
+import orjson
 import hashlib
-from datetime import datetime
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 import httpx
 from loguru import logger
 
-app = FastAPI()
 
-# Store communication tokens (same as in handlers.py)
-SESSION_TOKENS = {}
+# Communication tokens as parallel maps: token -> family_id and
+# token -> expiry on the monotonic clock, so validation needs no datetimes.
+# Like the SESSION_TOKENS dict they replace, nothing in this process fills
+# them yet; whatever issues tokens must write both maps
+SESSION_TOKENS_FAMILY: Dict[str, str] = {}
+SESSION_TOKENS_EXP: Dict[str, float] = {}
 
-def validate_comm_token(token: str, family_id: str) -> dict:
-    """Validate a communication token."""
-    if token not in SESSION_TOKENS:
-        return None
-    
-    session_data = SESSION_TOKENS[token]
+# Long-lived Telegram client so sends reuse pooled keep-alive connections
+TELEGRAM_CLIENT: Optional[httpx.AsyncClient] = None
+
+def _get_telegram_client() -> httpx.AsyncClient:
+    """Shared Telegram client, created on first use (works with or without lifespan)."""
+    global TELEGRAM_CLIENT
+    if TELEGRAM_CLIENT is None or TELEGRAM_CLIENT.is_closed:
+        TELEGRAM_CLIENT = httpx.AsyncClient(
+            base_url="https://api.telegram.org",
+            timeout=10.0,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=60),
+        )
+    return TELEGRAM_CLIENT
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    """Close the shared Telegram client on shutdown."""
+    global TELEGRAM_CLIENT
+    yield
+    if TELEGRAM_CLIENT is not None:
+        await TELEGRAM_CLIENT.aclose()
+        TELEGRAM_CLIENT = None
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=_lifespan)
+
+def discard_comm_token(token: str) -> None:
+    """Forget a communication token (used or expired)."""
+    SESSION_TOKENS_FAMILY.pop(token, None)
+    SESSION_TOKENS_EXP.pop(token, None)
+
+def validate_comm_token(token: str, family_id: str) -> Optional[str]:
+    """Validate a communication token; returns its family_id."""
+    fam = SESSION_TOKENS_FAMILY.get(token)
     
-    # Check if token is expired (24 hours)
-    if (datetime.now() - session_data['created_at']).total_seconds() > 86400:
-        del SESSION_TOKENS[token]
+    # Check if family_id matches
+    if fam is None or fam != family_id:
         return None
     
-    # Check if family_id matches
-    if session_data['family_id'] != family_id:
+    # Check if token is expired
+    if SESSION_TOKENS_EXP.get(token, 0.0) < time.monotonic():
+        discard_comm_token(token)
         return None
     
-    return session_data
+    return fam
 
 @app.post("/webhook/pwa-session")
 async def handle_pwa_session(request: Request):
     """Handle PWA session submission via webhook."""
     try:
-        data = await request.json()
+        data = orjson.loads(await request.body())
         
         # Extract data
         comm_token = data.get('comm_token')
@@ -52,12 +84,11 @@ async def handle_pwa_session(request: Request):
             raise HTTPException(status_code=400, detail="Missing required fields")
         
         # Validate communication token
-        session_data = validate_comm_token(comm_token, family_id)
-        if not session_data:
+        if validate_comm_token(comm_token, family_id) is None:
             raise HTTPException(status_code=401, detail="Invalid or expired token")
         
         # Clean up used token
-        del SESSION_TOKENS[comm_token]
+        discard_comm_token(comm_token)
         
         # Send message to Telegram
         bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -74,21 +105,21 @@ async def handle_pwa_session(request: Request):
         )
         
         # Send to Telegram
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"https://api.telegram.org/bot{bot_token}/sendMessage",
-                json={
-                    "chat_id": chat_id,
-                    "text": message,
-                    "parse_mode": "Markdown"
-                }
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"Failed to send Telegram message: {response.text}")
-                raise HTTPException(status_code=500, detail="Failed to send message")
+        response = await _get_telegram_client().post(
+            f"/bot{bot_token}/sendMessage",
+            content=orjson.dumps({
+                "chat_id": chat_id,
+                "text": message,
+                "parse_mode": "Markdown"
+            }),
+            headers={"content-type": "application/json"}
+        )
+        
+        if response.status_code != 200:
+            logger.error(f"Failed to send Telegram message: {response.text}")
+            raise HTTPException(status_code=500, detail="Failed to send message")
         
-        return JSONResponse({"status": "success", "message": "Session processed successfully"})
+        return ORJSONResponse({"status": "success", "message": "Session processed successfully"})
         
     except Exception as e:
         logger.error(f"Error in webhook: {e}")
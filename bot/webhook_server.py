@@ -3,28 +3,54 @@ Webhook server for direct PWA communication
 """
 
 import os
-import json
+import orjson
 import asyncio
 from datetime import datetime
+from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 import httpx
 from loguru import logger
 from .models import EventRecord
 from .storage import Storage
 from .handlers import convert_pwa_to_bot_format, validate_session_token
 
-app = FastAPI()
 storage = Storage()
 
 # Store communication tokens (same as in handlers.py)
 SESSION_TOKENS = {}
 
+# Long-lived Telegram client so sends reuse pooled keep-alive connections
+TELEGRAM_CLIENT: Optional[httpx.AsyncClient] = None
+
+def _get_telegram_client() -> httpx.AsyncClient:
+    """Shared Telegram client, created on first use (works with or without lifespan)."""
+    global TELEGRAM_CLIENT
+    if TELEGRAM_CLIENT is None or TELEGRAM_CLIENT.is_closed:
+        TELEGRAM_CLIENT = httpx.AsyncClient(
+            base_url="https://api.telegram.org",
+            timeout=10.0,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=60),
+        )
+    return TELEGRAM_CLIENT
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    """Close the shared Telegram client on shutdown."""
+    global TELEGRAM_CLIENT
+    yield
+    if TELEGRAM_CLIENT is not None:
+        await TELEGRAM_CLIENT.aclose()
+        TELEGRAM_CLIENT = None
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=_lifespan)
+
 @app.post("/webhook/pwa-session")
 async def handle_pwa_session(request: Request):
     """Handle PWA session submission via webhook."""
     try:
-        data = await request.json()
+        data = orjson.loads(await request.body())
         
         # Extract data
         comm_token = data.get('comm_token')
@@ -77,21 +103,21 @@ async def handle_pwa_session(request: Request):
         )
         
         # Send to Telegram
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"https://api.telegram.org/bot{bot_token}/sendMessage",
-                json={
-                    "chat_id": chat_id,
-                    "text": confirmation,
-                    "parse_mode": "Markdown"
-                }
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"Failed to send Telegram message: {response.text}")
-                raise HTTPException(status_code=500, detail="Failed to send confirmation")
+        response = await _get_telegram_client().post(
+            f"/bot{bot_token}/sendMessage",
+            content=orjson.dumps({
+                "chat_id": chat_id,
+                "text": confirmation,
+                "parse_mode": "Markdown"
+            }),
+            headers={"content-type": "application/json"}
+        )
+        
+        if response.status_code != 200:
+            logger.error(f"Failed to send Telegram message: {response.text}")
+            raise HTTPException(status_code=500, detail="Failed to send confirmation")
         
-        return JSONResponse({
+        return ORJSONResponse({
             "status": "success", 
             "message": "Session processed successfully",
             "session_id": converted_data['session_id']
@@ -18,19 +18,34 @@ from __future__ import annotations
 import hmac
 import json
 import os
+import re
 import time
 from base64 import urlsafe_b64encode
+from functools import lru_cache
 from hashlib import sha256
 from typing import Dict, Optional
-from urllib.parse import urlparse, urlunparse, urlencode, parse_qsl, ParseResult
+from urllib.parse import urlparse, urlunparse, urlencode, ParseResult
 
 
 # ------------------------------- JWT ---------------------------------
 
 
-def _b64url(data: bytes) -> str:
+def _b64url(data: bytes) -> bytes:
     """Base64url encode without padding, as required by JWT."""
-    return urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+    # The pad length follows from the input length; slice it off instead of scanning
+    pad = -len(data) % 3
+    enc = urlsafe_b64encode(data)
+    return enc[:-pad] if pad else enc
+
+
+# The header never changes: b64url('{"alg":"HS256","typ":"JWT"}')
+_HEADER_B64 = b"eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9"
+
+
+@lru_cache(maxsize=4)
+def _hmac_template(secret: str) -> hmac.HMAC:
+    """Keyed HMAC-SHA256 with no data yet; copy() it to skip the key schedule."""
+    return hmac.new(secret.encode("utf-8"), None, sha256)
 
 
 def encode_jwt_hs256(payload: Dict, secret: str) -> str:
@@ -38,13 +53,11 @@ def encode_jwt_hs256(payload: Dict, secret: str) -> str:
     Minimal HS256 JWT encoder (no external dependencies).
     Caller is responsible for including an 'exp' (unix seconds) in payload.
     """
-    header = {"alg": "HS256", "typ": "JWT"}
-    header_b64 = _b64url(json.dumps(header, separators=(",", ":")).encode("utf-8"))
-    payload_b64 = _b64url(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
-    signing_input = f"{header_b64}.{payload_b64}".encode("ascii")
-    sig = hmac.new(secret.encode("utf-8"), signing_input, sha256).digest()
-    sig_b64 = _b64url(sig)
-    return f"{header_b64}.{payload_b64}.{sig_b64}"
+    # Stay in bytes until the final decode
+    signing_input = _HEADER_B64 + b"." + _b64url(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    mac = _hmac_template(secret).copy()
+    mac.update(signing_input)
+    return (signing_input + b"." + _b64url(mac.digest())).decode("ascii")
 
 
 def mint_autoingest_token(
@@ -80,6 +93,14 @@ def mint_autoingest_token(
 # ------------------------- PWA deep-linking ---------------------------
 
 
+# Query values made only of these characters are left unchanged by urlencode
+_URL_SAFE = re.compile(r"[A-Za-z0-9_.\-]+")
+_DEEPLINK_KEYS = frozenset({"mode", "family", "session", "dyad", "tok"})
+
+# `tok` query parameter and its value, up to the next parameter or fragment
+_TOK_RE = re.compile(r"([?&]tok=)[^&#]*")
+
+
 def _normalize_host_and_path(pwa_host: str, pwa_path: Optional[str]) -> ParseResult:
     """
     Accepts:
@@ -132,6 +153,25 @@ def build_pwa_deeplink(
           token="eyJhbGciOi..."
       )
     """
+    # Fast path: a bare host and plain identifiers need no URL parsing or quoting
+    values = [mode, family_id, session_id, dyad]
+    if token:
+        values.append(token)
+    if extra_params:
+        values.extend(str(k) for k in extra_params)
+        values.extend(str(v) for v in extra_params.values())
+    overrides = extra_params and not _DEEPLINK_KEYS.isdisjoint(extra_params)
+    if "://" not in pwa_host and not overrides and all(_URL_SAFE.fullmatch(v) for v in values):
+        p = (pwa_path or "").strip()
+        if p and not p.startswith("/"):
+            p = "/" + p
+        url = f"https://{pwa_host}{p.rstrip('/')}?mode={mode}&family={family_id}&session={session_id}&dyad={dyad}"
+        if token:
+            url += f"&tok={token}"
+        if extra_params:
+            url += "".join(f"&{k}={v}" for k, v in extra_params.items())
+        return url
+
     base = _normalize_host_and_path(pwa_host, pwa_path)
     params: Dict[str, str] = {
         "mode": mode,
@@ -152,11 +192,9 @@ def redact_url_token(url: str, repl: str = "REDACTED") -> str:
     """
     Replace the value of `tok` in a URL with a redacted marker for safe logging.
     """
-    parsed = urlparse(url)
-    q = dict(parse_qsl(parsed.query, keep_blank_values=True))
-    if "tok" in q:
-        q["tok"] = repl
-    return urlunparse(parsed._replace(query=urlencode(q)))
+    if "tok=" not in url:
+        return url
+    return _TOK_RE.sub(lambda m: m.group(1) + repl, url)
 
 
 # ------------------------------ Env ----------------------------------
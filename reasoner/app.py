@@ -11,7 +11,7 @@ from typing import Dict, List, Any, Optional
 from dataclasses import dataclass, asdict
 from flask import Flask, request, jsonify
 from ollama_client import OllamaClient, create_system_message, create_user_message
-from prompts import get_prompt
+from prompts import get_prompt, get_system_message
 from validators import validate_reasoning
 from cache import ReasonerCache
 
@@ -37,19 +37,33 @@ class ReasoningResponse:
     rationale: str  # Explanation of reasoning
     metric_overrides: Optional[Dict[str, float]] = None  # Optional metric adjustments
 
+PII_FIELDS = frozenset({
+    'name', 'email', 'phone', 'address', 'child_name', 'family_name',
+    'notes', 'description', 'comments', 'details'
+})
+
 def redact_pii(data: Dict[str, Any]) -> Dict[str, Any]:
-    """Remove PII fields from data"""
-    pii_fields = {
-        'name', 'email', 'phone', 'address', 'child_name', 'family_name',
-        'notes', 'description', 'comments', 'details'
-    }
+    """Remove PII fields from data (copy-on-write: clean branches are shared, not copied)"""
     
     def _redact_recursive(obj):
         if isinstance(obj, dict):
-            return {k: '[REDACTED]' if k.lower() in pii_fields else _redact_recursive(v) 
-                   for k, v in obj.items()}
+            out = None
+            for k, v in obj.items():
+                new = '[REDACTED]' if k.lower() in PII_FIELDS else _redact_recursive(v)
+                if new is not v:
+                    if out is None:
+                        out = dict(obj)
+                    out[k] = new
+            return obj if out is None else out
         elif isinstance(obj, list):
-            return [_redact_recursive(item) for item in obj]
+            out = None
+            for i, item in enumerate(obj):
+                new = _redact_recursive(item)
+                if new is not item:
+                    if out is None:
+                        out = list(obj)
+                    out[i] = new
+            return obj if out is None else out
         else:
             return obj
     
@@ -209,19 +223,8 @@ def reason():
         if not ollama_client.health_check():
             return jsonify({'error': 'Ollama runtime not available'}), 503
         
-        # Prepare messages for Ollama
-        prompt = get_prompt(reasoning_request.dyad)
-        
-        # Build system message with strict JSON requirement
-        system_message = f"""{prompt['system']}
-
-Return ONLY JSON with keys: tips (array of ≤2 strings), rationale (string ≤140 chars), metric_overrides (object, optional). No prose, no markdown.
-
-Constraints:
-- Tips: ≤2 items, each ≤25 words
-- Rationale: ≤140 characters
-- Tone: {prompt['constraints']['tone']}
-- Forbidden: {', '.join(prompt['constraints']['forbidden'])}"""
+        # System message with strict JSON requirement (rendered once per dyad)
+        system_message = get_system_message(reasoning_request.dyad)
 
         user_message = prepare_user_message(reasoning_request)
         
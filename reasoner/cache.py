@@ -4,11 +4,12 @@ In-memory cache for reasoner responses
 Provides LRU eviction and TTL-based expiration
 """
 
-import json
 import hashlib
+import heapq
+import orjson
 import time
 import os
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from collections import OrderedDict
 
 class ReasonerCache:
@@ -20,7 +21,10 @@ class ReasonerCache:
         self.max_size = int(os.getenv('REASONER_CACHE_MAX', 256))  # 256 entries default
         
         # Cache storage: OrderedDict for LRU behavior
-        self._cache: OrderedDict[str, Tuple[Dict[str, Any], float]] = OrderedDict()
+        self._cache: OrderedDict[bytes, Tuple[Dict[str, Any], float]] = OrderedDict()
+        # (timestamp, key) min-heap; entries whose timestamp no longer matches
+        # the cached one (updated or already removed) are skipped when popped
+        self._expiry_heap: List[Tuple[float, bytes]] = []
         
         # Statistics
         self.hits = 0
@@ -28,7 +32,7 @@ class ReasonerCache:
         self.evictions = 0
         
     def _generate_cache_key(self, dyad: str, features: Dict[str, Any], 
-                           context: Dict[str, Any], metrics: Dict[str, Any]) -> str:
+                           context: Dict[str, Any], metrics: Dict[str, Any]) -> bytes:
         """
         Generate cache key from request parameters
         
@@ -39,7 +43,7 @@ class ReasonerCache:
             metrics: Computed metrics
             
         Returns:
-            SHA256 hash of the request parameters
+            128-bit BLAKE2b digest of the request parameters
         """
         # Create a normalized request dict
         request_data = {
@@ -49,11 +53,12 @@ class ReasonerCache:
             'metrics': metrics
         }
         
-        # Convert to JSON with sorted keys for consistent hashing
-        json_str = json.dumps(request_data, sort_keys=True, separators=(',', ':'))
+        # Compact JSON bytes with sorted keys for consistent hashing
+        json_bytes = orjson.dumps(request_data, option=orjson.OPT_SORT_KEYS)
         
-        # Generate SHA256 hash
-        return hashlib.sha256(json_str.encode('utf-8')).hexdigest()
+        # Keys only need to be collision-resistant, not secure: a raw 16-byte
+        # BLAKE2b digest is cheaper to compute and to hash than a hex SHA256
+        return hashlib.blake2b(json_bytes, digest_size=16).digest()
     
     def get(self, dyad: str, features: Dict[str, Any], 
             context: Dict[str, Any], metrics: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -117,6 +122,7 @@ class ReasonerCache:
         if cache_key in self._cache:
             self._cache.move_to_end(cache_key)
             self._cache[cache_key] = (response, current_time)
+            heapq.heappush(self._expiry_heap, (current_time, cache_key))
             return
         
         # Check if we need to evict due to size limit
@@ -127,6 +133,7 @@ class ReasonerCache:
         
         # Add new entry
         self._cache[cache_key] = (response, current_time)
+        heapq.heappush(self._expiry_heap, (current_time, cache_key))
     
     def _cleanup_expired(self, current_time: float) -> None:
         """
@@ -135,18 +142,17 @@ class ReasonerCache:
         Args:
             current_time: Current timestamp
         """
-        expired_keys = []
-        
-        for key, (_, timestamp) in self._cache.items():
-            if current_time - timestamp > self.ttl_seconds:
-                expired_keys.append(key)
-        
-        for key in expired_keys:
-            del self._cache[key]
+        heap = self._expiry_heap
+        while heap and current_time - heap[0][0] > self.ttl_seconds:
+            timestamp, key = heapq.heappop(heap)
+            entry = self._cache.get(key)
+            if entry is not None and entry[1] == timestamp:
+                del self._cache[key]
     
     def clear(self) -> None:
         """Clear all cached entries"""
         self._cache.clear()
+        self._expiry_heap.clear()
         self.hits = 0
         self.misses = 0
         self.evictions = 0
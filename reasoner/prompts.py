@@ -5,6 +5,90 @@ Dyad-specific prompt templates for Silli's reasoning engine
 
 from typing import Literal, Dict, Any, List
 
+_BASE_SYSTEM = (
+    "You are Silli's reasoning engine. Be calm, brief, practical. "
+    "No medical or diagnostic advice. No judgments. Parent-friendly wording."
+)
+
+_BASE_CONSTRAINTS = {
+    "tip_words_max": 25,
+    "tips_max": 2,
+    "tone": "calm, non-anthropomorphic",
+    "forbidden": ["medical diagnosis", "threats", "shaming"]
+}
+
+_FEW_SHOT_EXAMPLES = {
+    "tantrum": [
+        {
+            "features": {"vad_fraction": 0.7, "flux_norm": 0.6},
+            "context": {"trigger": "transition"},
+            "out": {
+                "tips": [
+                    "Lower your voice and narrate one feeling.",
+                    "Offer a small choice (shirt A/B)."
+                ],
+                "rationale": "Likely frustration around change."
+            }
+        }
+    ],
+    "meal": [
+        {
+            "features": {},
+            "context": {"eaten_pct": 30, "stress_level": 3},
+            "out": {
+                "tips": [
+                    "Shrink portions; praise any tasting.",
+                    "Keep table uncluttered for one meal."
+                ],
+                "rationale": "Refusal with visual overload."
+            }
+        }
+    ],
+    "night": [
+        {
+            "features": {"vad_fraction": 0.2},
+            "context": {},
+            "out": {
+                "tips": [
+                    "Dim lights and pause screens 20 min.",
+                    "Lower room sound—close door slightly."
+                ],
+                "rationale": "Low arousal; environmental tweak helps."
+            }
+        }
+    ]
+}
+
+# Built once at import; callers get shared, read-only templates
+_PROMPTS: Dict[str, Dict[str, Any]] = {
+    dyad: {
+        "system": _BASE_SYSTEM,
+        "constraints": _BASE_CONSTRAINTS,
+        "few_shot": examples
+    }
+    for dyad, examples in _FEW_SHOT_EXAMPLES.items()
+}
+
+_SYSTEM_MESSAGE_TEMPLATE = """{system}
+
+Return ONLY JSON with keys: tips (array of ≤2 strings), rationale (string ≤140 chars), metric_overrides (object, optional). No prose, no markdown.
+
+Constraints:
+- Tips: ≤2 items, each ≤25 words
+- Rationale: ≤140 characters
+- Tone: {tone}
+- Forbidden: {forbidden}"""
+
+_SYSTEM_MESSAGES: Dict[str, str] = {
+    dyad: _SYSTEM_MESSAGE_TEMPLATE.format(
+        system=prompt["system"],
+        tone=prompt["constraints"]["tone"],
+        forbidden=", ".join(prompt["constraints"]["forbidden"])
+    )
+    for dyad, prompt in _PROMPTS.items()
+}
+
+
 def get_prompt(dyad: Literal["night", "tantrum", "meal"]) -> Dict[str, Any]:
     """
     Get dyad-specific prompt template
@@ -15,63 +99,17 @@ def get_prompt(dyad: Literal["night", "tantrum", "meal"]) -> Dict[str, Any]:
     Returns:
         Prompt template with system message, constraints, and few-shot examples
     """
+    return _PROMPTS[dyad]
+
+
+def get_system_message(dyad: Literal["night", "tantrum", "meal"]) -> str:
+    """
+    Get the rendered system message for a dyad
     
-    base_system = (
-        "You are Silli's reasoning engine. Be calm, brief, practical. "
-        "No medical or diagnostic advice. No judgments. Parent-friendly wording."
-    )
-    
-    base_constraints = {
-        "tip_words_max": 25,
-        "tips_max": 2,
-        "tone": "calm, non-anthropomorphic",
-        "forbidden": ["medical diagnosis", "threats", "shaming"]
-    }
-    
-    few_shot_examples = {
-        "tantrum": [
-            {
-                "features": {"vad_fraction": 0.7, "flux_norm": 0.6},
-                "context": {"trigger": "transition"},
-                "out": {
-                    "tips": [
-                        "Lower your voice and narrate one feeling.",
-                        "Offer a small choice (shirt A/B)."
-                    ],
-                    "rationale": "Likely frustration around change."
-                }
-            }
-        ],
-        "meal": [
-            {
-                "features": {},
-                "context": {"eaten_pct": 30, "stress_level": 3},
-                "out": {
-                    "tips": [
-                        "Shrink portions; praise any tasting.",
-                        "Keep table uncluttered for one meal."
-                    ],
-                    "rationale": "Refusal with visual overload."
-                }
-            }
-        ],
-        "night": [
-            {
-                "features": {"vad_fraction": 0.2},
-                "context": {},
-                "out": {
-                    "tips": [
-                        "Dim lights and pause screens 20 min.",
-                        "Lower room sound—close door slightly."
-                    ],
-                    "rationale": "Low arousal; environmental tweak helps."
-                }
-            }
-        ]
-    }
-    
-    return {
-        "system": base_system,
-        "constraints": base_constraints,
-        "few_shot": few_shot_examples[dyad]
-    } 
\ No newline at end of file
+    Args:
+        dyad: The dyad type (night, tantrum, meal)
+        
+    Returns:
+        System message with the strict JSON and constraint instructions
+    """
+    return _SYSTEM_MESSAGES[dyad]
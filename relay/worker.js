@@ -85,13 +85,37 @@ async function handlePull(request, env) {
     return json({ error: 'unauthorized' }, 401);
   }
 
-  const chatId = url.searchParams.get('chat_id');
   const limit = parseInt(url.searchParams.get('limit') || '5', 10);
+
+  // Batch mode: chat_ids=1,2,3 -> { items_by_chat: { "1": [...], ... } }
+  const chatIds = url.searchParams.get('chat_ids');
+  if (chatIds) {
+    const ids = chatIds.split(',').filter(Boolean);
+    const results = await Promise.all(ids.map((id) => takePending(env, id, limit)));
+    // NDJSON: one {chat_id, key, data} line per item, so the bot can parse as it reads
+    if ((request.headers.get('accept') || '').includes('application/x-ndjson')) {
+      const lines = [];
+      ids.forEach((id, i) => {
+        for (const item of results[i]) lines.push(JSON.stringify({ chat_id: id, ...item }));
+      });
+      return new Response(lines.length ? lines.join('\n') + '\n' : '', {
+        headers: { 'content-type': 'application/x-ndjson', ...corsHeaders() }
+      });
+    }
+    const itemsByChat = {};
+    ids.forEach((id, i) => { itemsByChat[id] = results[i]; });
+    return json({ ok: true, items_by_chat: itemsByChat });
+  }
+
+  const chatId = url.searchParams.get('chat_id');
   if (!chatId) return json({ error: 'missing chat_id' }, 400);
+  return json({ ok: true, items: await takePending(env, chatId, limit) });
+}
 
+async function takePending(env, chatId, limit) {
   const listKey = `pending:${chatId}`;
   const pending = (await env.SILLI_SESSIONS.get(listKey, 'json')) || [];
-  if (!pending.length) return json({ ok: true, items: [] });
+  if (!pending.length) return [];
 
   const take = pending.splice(0, Math.max(1, Math.min(limit, 10)));
   await env.SILLI_SESSIONS.put(listKey, JSON.stringify(pending), { expirationTtl: 60 * 60 * 24 * 7 });
@@ -103,7 +127,7 @@ async function handlePull(request, env) {
     // (Optional) delete after pull:
     await env.SILLI_SESSIONS.delete(key);
   }
-  return json({ ok: true, items });
+  return items;
 }
 
 function json(obj, status = 200) {
@@ -5,7 +5,8 @@ Self-test for Family Profiles system
 
 import asyncio
 import json
-from bot.profiles import profiles, Child
+import tempfile
+from bot.profiles import ProfilesStore, Child
 
 
 async def test_profiles():
@@ -13,6 +14,9 @@ async def test_profiles():
     print("🧪 Testing Family Profiles System")
     print("=" * 50)
     
+    # Scratch store so the repo's data/ is never touched
+    profiles = ProfilesStore(tempfile.mkdtemp(prefix="silli-profiles-"))
+    
     # Test 1: Create profile for chat_id=111
     print("\n1. Creating profile for chat_id=111...")
     profile1 = await profiles.create_or_get(111)
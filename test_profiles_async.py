@@ -5,6 +5,7 @@ Async test for Family Profiles system using the full API
 
 import asyncio
 import json
+import tempfile
 from bot.profiles import ProfilesStore, Child
 
 
@@ -13,8 +14,8 @@ async def test_profiles_async():
     print("🧪 Testing Family Profiles System (Async)")
     print("=" * 50)
     
-    # Create store
-    store = ProfilesStore()
+    # Create store in a scratch dir so the repo's data/ is never touched
+    store = ProfilesStore(tempfile.mkdtemp(prefix="silli-profiles-"))
     
     # Test 1: Create profile for chat_id=111
     print("\n1. Creating profile for chat_id=111...")
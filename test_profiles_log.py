@@ -4,6 +4,7 @@ Test for Family Profiles JSONL logging
 """
 
 import json
+import tempfile
 from bot.profiles import ProfilesStore, FamilyProfile
 from datetime import datetime
 
@@ -13,8 +14,8 @@ def test_profiles_log():
     print("🧪 Testing Family Profiles JSONL Logging")
     print("=" * 50)
     
-    # Create store
-    store = ProfilesStore()
+    # Create store in a scratch dir so the repo's data/ is never touched
+    store = ProfilesStore(tempfile.mkdtemp(prefix="silli-profiles-"))
     
     # Test 1: Create a profile manually
     print("\n1. Creating profile manually...")
@@ -4,6 +4,7 @@ Simple test for Family Profiles system
 """
 
 import json
+import tempfile
 from bot.profiles import ProfilesStore, Child
 
 
@@ -12,8 +13,8 @@ def test_profiles_sync():
     print("🧪 Testing Family Profiles System (Simple)")
     print("=" * 50)
     
-    # Create store
-    store = ProfilesStore()
+    # Create store in a scratch dir so the repo's data/ is never touched
+    store = ProfilesStore(tempfile.mkdtemp(prefix="silli-profiles-"))
     
     # Test 1: Create profile for chat_id=111
     print("\n1. Creating profile for chat_id=111...")
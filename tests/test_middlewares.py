@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the profile gate middleware
+"""
+
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.middlewares import ONBOARD_KB, ProfileGateMiddleware
+from bot.profiles import ProfilesStore
+
+
+def test_allowed_commands():
+    """Only whole allowed command tokens bypass the gate"""
+    gate = ProfileGateMiddleware(profiles_store=None)
+
+    assert gate._is_allowed("/start")
+    assert gate._is_allowed("/help me")
+    assert gate._is_allowed("/onboard@silli_bot")
+    assert gate._is_allowed("/onboard")  # callback_data of the onboarding button
+
+    assert not gate._is_allowed("")
+    assert not gate._is_allowed("start")
+    assert not gate._is_allowed("/startle")
+    assert not gate._is_allowed("/export")
+    assert not gate._is_allowed("dyad:night")
+
+
+def test_profile_cache_invalidated_by_store(tmp_path):
+    """Cached lookups (including misses) are dropped when the store changes"""
+    store = ProfilesStore(str(tmp_path))
+    gate = ProfileGateMiddleware(store)
+
+    async def run():
+        assert await gate._get_profile(42) is None
+        assert 42 in gate._cache
+
+        profile = await store.create_or_get(42)
+        assert 42 not in gate._cache
+        assert await gate._get_profile(42) is profile
+
+        await store.mark_complete(profile.family_id)
+        assert 42 not in gate._cache
+        assert (await gate._get_profile(42)).complete
+
+        await store.remove_member(profile.family_id, 42)
+        assert await gate._get_profile(42) is None
+
+    asyncio.run(run())
+
+
+def test_message_gate(tmp_path):
+    """Incomplete chats are prompted to onboard unless mid-onboarding"""
+    gate = ProfileGateMiddleware(ProfilesStore(str(tmp_path)))
+    replies = []
+    handled = []
+
+    async def reply(text, **kwargs):
+        replies.append(text)
+
+    async def handler(event, data):
+        handled.append(event.text)
+
+    def message(text):
+        return SimpleNamespace(chat=SimpleNamespace(id=7), text=text, reply=reply)
+
+    async def run():
+        await gate.on_message(handler, message("/export"), {})
+        await gate.on_message(handler, message("/start"), {})
+        await gate.on_message(handler, message("/join ABC123"), {})
+        await gate.on_message(handler, message("Ana"), {"raw_state": "OnboardStates:AskParentName"})
+        await gate.on_message(handler, message("Ana"), {"raw_state": None})
+
+    asyncio.run(run())
+
+    assert handled == ["/start", "/join ABC123", "Ana"]
+    assert len(replies) == 2
+
+
+def test_callback_gate(tmp_path):
+    """Button presses are gated like messages; the onboarding button always passes"""
+    gate = ProfileGateMiddleware(ProfilesStore(str(tmp_path)))
+    replies = []
+    answered = []
+    handled = []
+
+    async def reply(text, **kwargs):
+        replies.append(kwargs.get("reply_markup"))
+
+    async def handler(event, data):
+        handled.append(event.data)
+
+    def callback(data):
+        async def answer(*args, **kwargs):
+            answered.append(data)
+        return SimpleNamespace(message=SimpleNamespace(chat=SimpleNamespace(id=7), reply=reply),
+                               data=data, answer=answer)
+
+    async def run():
+        await gate.on_callback_query(handler, callback("dyad:night"), {})
+        await gate.on_callback_query(handler, callback("/onboard"), {})
+        await gate.on_callback_query(handler, callback("tz:UTC"), {"raw_state": "OnboardStates:AskTimezone"})
+
+    asyncio.run(run())
+
+    assert handled == ["/onboard", "tz:UTC"]
+    assert replies == [ONBOARD_KB]
+    assert answered == ["dyad:night"]
+
+
+def test_onboard_button_starts_onboarding():
+    """The gate's "Start Onboarding" button enters the first onboarding step"""
+    from aiogram.fsm.context import FSMContext
+    from aiogram.fsm.storage.base import StorageKey
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from bot.onboarding import OnboardStates, start_onboarding_cb
+
+    state = FSMContext(MemoryStorage(), StorageKey(bot_id=1, chat_id=7, user_id=7))
+    replies = []
+    answered = []
+
+    async def reply(text, **kwargs):
+        replies.append(text)
+
+    async def answer(*args, **kwargs):
+        answered.append(True)
+
+    cb = SimpleNamespace(message=SimpleNamespace(reply=reply), data="/onboard", answer=answer)
+
+    async def run():
+        await state.set_state(OnboardStates.Confirm)
+        await state.update_data(parent_name="Old")
+        await start_onboarding_cb(cb, state)
+        return await state.get_state(), await state.get_data()
+
+    current, data = asyncio.run(run())
+
+    assert current == OnboardStates.AskParentName.state
+    assert data == {}
+    assert replies and "first name" in replies[0]
+    assert answered == [True]
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Unit tests for ProfilesStore persistence
+"""
+
+import sys
+import os
+import json
+import asyncio
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.profiles import Child, ProfilesStore
+
+
+def test_profiles_persist_per_family(tmp_path):
+    """Each family is written to its own file and reloads on restart"""
+    store = ProfilesStore(str(tmp_path))
+
+    async def run():
+        await store.create_or_get(111)
+        await store.create_or_get(222)
+        await store.upsert_fields("fam_111", parent_name="Sarah", complete=True)
+
+    asyncio.run(run())
+
+    assert sorted(p.name for p in (tmp_path / "profiles").glob("*.json")) == ["fam_111.json", "fam_222.json"]
+
+    reloaded = ProfilesStore(str(tmp_path))
+    profile = asyncio.run(reloaded.get_profile_by_chat(111))
+    assert profile.parent_name == "Sarah"
+    assert profile.complete
+
+
+def test_legacy_index_is_migrated(tmp_path):
+    """An old profiles_index.json is split into per-family files"""
+    legacy = {
+        "fam_5": {
+            "family_id": "fam_5", "creator_chat_id": 5, "members": [5, 6],
+            "parent_name": "Ana", "created_at": "2025-08-05 22:39:30.174860",
+            "updated_at": "2025-08-05 22:39:30.175836", "complete": True
+        }
+    }
+    with open(tmp_path / "profiles_index.json", "w") as f:
+        json.dump(legacy, f)
+
+    store = ProfilesStore(str(tmp_path))
+
+    assert not (tmp_path / "profiles").exists()  # loading alone writes nothing
+    assert asyncio.run(store.get_profile_by_chat(6)).parent_name == "Ana"
+    store.start()
+    assert (tmp_path / "profiles" / "fam_5.json").exists()
+    assert json.loads((tmp_path / "chat_index.json").read_text()) == {"5": "fam_5", "6": "fam_5"}
+
+
+def test_children_are_stored_as_columns(tmp_path):
+    """Old `children` lists load into the child columns and read back as Child records"""
+    (tmp_path / "profiles").mkdir()
+    with open(tmp_path / "profiles" / "fam_5.json", "w") as f:
+        json.dump({
+            "family_id": "fam_5", "creator_chat_id": 5, "members": [5],
+            "parent_name": "Ana", "created_at": "2025-08-05T22:39:30",
+            "updated_at": "2025-08-05T22:39:30",
+            "children": [{"name": "Emma", "age_years": 4.5, "sex": "f"}]
+        }, f)
+
+    store = ProfilesStore(str(tmp_path))
+    profile = asyncio.run(store.get_profile("fam_5"))
+    assert profile.child_names == ["Emma"]
+    assert profile.children == [Child(name="Emma", age_years=4.5, sex="f")]
+
+    liam = Child(name="Liam", age_years=2.0, sex="m")
+    profile = asyncio.run(store.upsert_fields("fam_5", children=profile.children + [liam], bogus=1))
+    assert profile.child_sexes == ["f", "m"]
+    assert "children" not in json.loads(profile.model_dump_json())
+    assert not hasattr(profile, "bogus")
+
+
+def test_profiles_load_lazily(tmp_path):
+    """Restart loads only the chat index; profiles come off disk when asked for"""
+    store = ProfilesStore(str(tmp_path))
+
+    async def setup():
+        await store.create_or_get(1)
+        await store.create_or_get(2)
+        code = await store.generate_join_code("fam_1")
+        await store.consume_join_code(code, 3)
+
+    asyncio.run(setup())
+
+    store = ProfilesStore(str(tmp_path))
+    store.cache_size = 1
+    assert len(store._index) == 0
+    assert store._chat_to_family == {1: "fam_1", 2: "fam_2", 3: "fam_1"}
+
+    assert asyncio.run(store.get_profile_by_chat(3)).members == [1, 3]
+    assert asyncio.run(store.get_profile_by_chat(2)).family_id == "fam_2"
+    assert list(store._index) == ["fam_2"]
+
+    # Without chat_index.json the index is rebuilt from the snapshots
+    os.remove(tmp_path / "chat_index.json")
+    assert ProfilesStore(str(tmp_path))._chat_to_family == {1: "fam_1", 2: "fam_2", 3: "fam_1"}
+
+
+def test_snapshot_writes_are_coalesced(tmp_path):
+    """A burst of mutations to one family is written once"""
+    store = ProfilesStore(str(tmp_path))
+    store.snapshot_interval = 0.05
+    saved = []
+    save_profile = store._save_profile
+    store._save_profile = lambda profile: (saved.append(profile.family_id), save_profile(profile))
+
+    async def run():
+        await store.create_or_get(1)
+        await store.upsert_fields("fam_1", parent_name="Ana")
+        await store.mark_complete("fam_1")
+        assert saved == []
+        await asyncio.sleep(store.snapshot_interval * 2)
+
+    asyncio.run(run())
+
+    assert saved == ["fam_1"]
+    assert ProfilesStore(str(tmp_path))._get_cached("fam_1").complete
+
+
+def test_each_logged_mutation_counts_once(tmp_path):
+    """compact_every counts log events, not dirty-marking calls"""
+    store = ProfilesStore(str(tmp_path))
+    counts = []
+
+    async def run():
+        await store.create_or_get(1)
+        counts.append(store._events_since_snapshot)
+        await store.add_member("fam_1", 2)
+        counts.append(store._events_since_snapshot)
+        await store.remove_member("fam_1", 2)
+        counts.append(store._events_since_snapshot)
+
+    asyncio.run(run())
+
+    assert counts == [1, 2, 3]
+    assert store.profiles_log_path.read_bytes() == b""  # compacted on exit
+    assert json.loads((tmp_path / "chat_index.json").read_text()) == {"1": "fam_1"}
+
+
+def test_append_log_off_loop(tmp_path):
+    """Mutations still append one log line each when written from a thread"""
+    store = ProfilesStore(str(tmp_path))
+
+    async def run():
+        await store.create_or_get(1)
+        await store.upsert_fields("fam_1", parent_name="Ana")
+        code = await store.generate_join_code("fam_1")
+        await store.consume_join_code(code, 2)
+        # Read before compaction truncates the log
+        with open(store.profiles_log_path) as f:
+            return [json.loads(line)["type"] for line in f]
+
+    assert asyncio.run(run()) == ["UPSERT_PROFILE", "SET_FIELDS", "ADD_MEMBER"]
+    assert ProfilesStore(str(tmp_path))._join_codes == {}
+
+
+def test_log_encodes_models_and_datetimes(tmp_path):
+    """Log lines serialize Child models and datetimes without a pre-pass"""
+    store = ProfilesStore(str(tmp_path))
+    store._append_log({
+        'type': 'SET_FIELDS',
+        'family_id': 'fam_1',
+        'payload': {
+            'children': [Child(name="Emma", age_years=4.5, sex="f")],
+            'updated_at': datetime(2025, 8, 5, 22, 39, 30)
+        }
+    })
+
+    with open(store.profiles_log_path) as f:
+        event = json.loads(f.readline())
+    assert event['payload']['children'] == [{"name": "Emma", "age_years": 4.5, "sex": "f"}]
+    assert event['payload']['updated_at'] == "2025-08-05T22:39:30"
+
+
+def test_log_tail_is_replayed_and_compacted(tmp_path):
+    """Events logged after the last snapshot are applied on restart"""
+    store = ProfilesStore(str(tmp_path))
+    asyncio.run(store.create_or_get(1))
+    assert store.profiles_log_path.read_bytes() == b""
+
+    # As if the process died after logging but before compacting
+    store._append_log({'type': 'SET_FIELDS', 'family_id': 'fam_1', 'payload': {'parent_name': 'Bo'}})
+    store._append_log({'type': 'ADD_MEMBER', 'family_id': 'fam_1', 'chat_id': 9})
+    store._append_log({'type': 'SET_FIELDS', 'family_id': 'fam_404', 'payload': {'parent_name': 'X'}})
+
+    log = store.profiles_log_path.read_bytes()
+    reloaded = ProfilesStore(str(tmp_path))
+    profile = asyncio.run(reloaded.get_profile_by_chat(9))
+    assert profile.parent_name == "Bo"
+    assert profile.members == [1, 9]
+    # Construction only replays; compaction waits for start()
+    assert reloaded.profiles_log_path.read_bytes() == log
+    assert json.loads((tmp_path / "profiles" / "fam_1.json").read_text())["members"] == [1]
+
+    reloaded.start()
+    assert reloaded.profiles_log_path.read_bytes() == b""
+    assert json.loads((tmp_path / "profiles" / "fam_1.json").read_text())["members"] == [1, 9]
+
+
+def test_expired_join_codes_are_collected(tmp_path):
+    """Expired codes are dropped via the expiry heap, including legacy entries"""
+    with open(tmp_path / "join_codes.json", "w") as f:
+        json.dump({"OLD123": {"family_id": "fam_1", "expires_at": "2020-01-01T00:00:00"}}, f)
+
+    store = ProfilesStore(str(tmp_path))
+    asyncio.run(store.create_or_get(1))
+    code = asyncio.run(store.generate_join_code("fam_1"))
+
+    assert store._garbage_collect_join_codes() == 1
+    assert list(store._join_codes) == [code]
+    assert [c for _, c in store._join_expiry] == [code]
+
+
+def test_families_do_not_block_each_other(tmp_path):
+    """A busy family doesn't hold up writes to another family"""
+    store = ProfilesStore(str(tmp_path))
+
+    async def run():
+        await store.create_or_get(1)
+        await store.create_or_get(2)
+        async with store._lock_for("fam_1"):
+            blocked = asyncio.create_task(store.upsert_fields("fam_1", parent_name="A"))
+            await asyncio.wait_for(store.upsert_fields("fam_2", parent_name="B"), 1)
+            assert not blocked.done()
+        await blocked
+
+    asyncio.run(run())
+    assert store._get_cached("fam_1").parent_name == "A"
+
+
+def test_failed_snapshot_keeps_log(tmp_path):
+    """A snapshot write failure keeps the log and retries the profile on the next flush"""
+    store = ProfilesStore(str(tmp_path))
+    asyncio.run(store.create_or_get(1))
+    save_profile = store._save_profile
+    store._save_profile = lambda profile: False
+
+    store._append_log({'type': 'SET_FIELDS', 'family_id': 'fam_1', 'payload': {'parent_name': 'Bo'}})
+    store._apply_event({'type': 'SET_FIELDS', 'family_id': 'fam_1', 'payload': {'parent_name': 'Bo'}})
+    store._events_since_snapshot += 1
+    store.flush()
+
+    assert store.profiles_log_path.read_bytes() != b""
+    assert "fam_1" in store._dirty
+
+    store._save_profile = save_profile
+    store.flush()
+    assert store.profiles_log_path.read_bytes() == b""
+    assert json.loads((tmp_path / "profiles" / "fam_1.json").read_text())["parent_name"] == "Bo"
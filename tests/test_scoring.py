@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Unit tests for Wind-Down scoring
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.models import FeatureSummary
+from bot.scoring import WindDownScorer
+
+
+def test_batch_scores_match_single_scores():
+    """The vectorized path agrees with per-record scoring, steady bonus included"""
+    scorer = WindDownScorer()
+    rows = [
+        # vad, flux, centroid, level_dbfs
+        (0.4, 0.05, 0.1, -30.0),   # steady
+        (0.5, 0.30, 0.6, -10.0),
+        (1.0, 1.00, 1.0, 0.0),     # clamps at 0
+        (0.0, 0.00, 0.0, -80.0),   # clamps at 100
+    ]
+    vad, flux, centroid, level = zip(*rows)
+
+    batch = scorer.calculate_scores_batch(vad, flux, centroid, level)
+
+    singles = [
+        scorer.calculate_score(FeatureSummary(
+            vad_fraction=v, flux_norm=f, centroid_norm=c, level_dbfs=l,
+            rolloff_norm=0.0, stationarity=0.0))
+        for v, f, c, l in rows
+    ]
+    assert batch.tolist() == singles
+    assert singles[0] == int(100 - 35 * 0.4 - 25 * 0.05 - 20 * 0.1 - 20 * 0.5 + 15)
+    assert singles[2] == 0 and singles[3] == 100
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Unit tests for event storage
+"""
+
+import sys
+import os
+import json
+import asyncio
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.models import EventRecord
+from bot.storage import Storage, _INGESTED, _tail_lines
+
+
+def make_event(n: int, family_id: str = "fam_1") -> EventRecord:
+    return EventRecord(
+        ts=datetime.now(),
+        family_id=family_id,
+        session_id=f"{family_id}_s{n}",
+        phase="adhoc",
+        actor="parent",
+        event="test_event",
+        labels=[f"n:{n}"]
+    )
+
+
+def read_lines(storage: Storage) -> list:
+    with open(storage.get_events_file_path(), 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_enqueue_without_writer_writes_inline(tmp_path):
+    """Without a running writer, enqueue_event falls back to a direct append"""
+    storage = Storage(tmp_path)
+    storage.enqueue_event(make_event(1))
+
+    lines = read_lines(storage)
+    assert [line["session_id"] for line in lines] == ["fam_1_s1"]
+
+
+def test_writer_batches_and_drains_on_cancel(tmp_path):
+    """Queued events are written in order, including those pending at shutdown"""
+    storage = Storage(tmp_path)
+
+    async def run():
+        task = asyncio.create_task(storage.run_writer())
+        await asyncio.sleep(0)
+
+        event = make_event(0)
+        storage.enqueue_event(event)
+        # Mutations after enqueue must not leak into the queued line
+        event.labels.append("late")
+        for n in range(1, 5):
+            storage.enqueue_event(make_event(n))
+
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+
+    lines = read_lines(storage)
+    assert [line["session_id"] for line in lines] == [f"fam_1_s{n}" for n in range(5)]
+    assert lines[0]["labels"] == ["n:0"]
+    # Writer is detached again, so appends go inline
+    storage.enqueue_event(make_event(5))
+    assert len(read_lines(storage)) == 6
+
+
+def test_ingested_sessions_are_indexed(tmp_path):
+    """Ingested session ids are indexed on load and on append, across instances"""
+    storage = Storage(tmp_path)
+    event = make_event(1)
+    event.event = "ingest_session_report"
+    storage.append_event(event)
+    storage.append_event(make_event(2))
+
+    assert storage.ingested("fam_1") == {"fam_1_s1"}
+    assert storage.ingested("fam_2") == set()
+    assert storage.has_ingested("fam_1", "fam_1_s1")
+    assert not storage.has_ingested("fam_1", "fam_1_s2")
+
+    # A fresh process rebuilds the index from the events file
+    _INGESTED.clear()
+    assert Storage(tmp_path).ingested("fam_1") == {"fam_1_s1"}
+
+
+def test_events_are_sharded_per_family(tmp_path):
+    """Reads hit only the family's shard; an existing events.jsonl is split once"""
+    with open(tmp_path / "events.jsonl", "wb") as f:
+        f.write(Storage._serialize_event(make_event(0, "fam_old")))
+
+    storage = Storage(tmp_path)
+    storage.append_events([make_event(n, "fam_1" if n % 2 else "fam_2") for n in range(1, 7)])
+
+    assert [e.session_id for e in storage.get_events("fam_old")] == ["fam_old_s0"]
+    assert [e.session_id for e in storage.get_events("fam_1")] == ["fam_1_s1", "fam_1_s3", "fam_1_s5"]
+    assert storage.get_events("fam_404") == []
+    assert len(read_lines(storage)) == 7
+
+    assert [e.session_id for e in storage.get_recent_events("fam_2", 2)] == ["fam_2_s4", "fam_2_s6"]
+    assert len(storage.get_recent_events("fam_2", 10)) == 3
+
+    lines = _tail_lines(storage._shard_path("fam_1"), 2, block_size=7)
+    assert [json.loads(line)["session_id"] for line in lines] == ["fam_1_s3", "fam_1_s5"]
+
+
+def test_shards_rebuilt_when_out_of_step(tmp_path):
+    """Shards that missed part of events.jsonl are rebuilt on the next start"""
+    storage = Storage(tmp_path)
+    storage.append_events([make_event(1), make_event(2, "fam_2")])
+    storage.close()
+    marker = storage.shards_marker.read_bytes()
+
+    # A clean restart keeps the shards as they are
+    assert Storage(tmp_path)._shards_in_step()
+    assert storage.shards_marker.read_bytes() == marker
+
+    # As if the process died after appending to events.jsonl but before the shard
+    with open(tmp_path / "events.jsonl", "ab") as f:
+        f.write(Storage._serialize_event(make_event(3)))
+
+    restarted = Storage(tmp_path)
+    assert [e.session_id for e in restarted.get_events("fam_1")] == ["fam_1_s1", "fam_1_s3"]
+    assert [e.session_id for e in restarted.get_events("fam_2")] == ["fam_2_s2"]
+    assert restarted._shards_in_step()
+    assert not (tmp_path / "events.stale").exists()
+
+    restarted.append_events([make_event(4, "fam_2")])
+    assert Storage(tmp_path)._shards_in_step()
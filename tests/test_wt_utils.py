@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Unit tests for relay token helpers
+"""
+
+import sys
+import os
+import json
+import hmac
+from base64 import urlsafe_b64decode
+from hashlib import sha256
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.wt_utils import encode_jwt_hs256, build_pwa_deeplink, redact_url_token
+
+
+def _b64decode(part: str) -> bytes:
+    return urlsafe_b64decode(part + "=" * (-len(part) % 4))
+
+
+def test_jwt_hs256_signature():
+    """Tokens carry the HS256 header and verify against the secret, across repeated mints"""
+    claims = {"chat_id": 1, "family_id": "fam_1", "session_id": "s", "exp": 1700000000}
+
+    for secret in ("secret-a", "secret-b", "secret-a"):
+        token = encode_jwt_hs256(claims, secret)
+        header, payload, sig = token.split(".")
+
+        assert json.loads(_b64decode(header)) == {"alg": "HS256", "typ": "JWT"}
+        assert json.loads(_b64decode(payload)) == claims
+        expected = hmac.new(secret.encode(), f"{header}.{payload}".encode(), sha256).digest()
+        assert _b64decode(sig) == expected
+
+
+def test_deeplink_fast_path_matches_urlencode():
+    """Plain identifiers skip URL parsing but build the same link as the urlencode path"""
+    kwargs = dict(pwa_path="silli-meter/", mode="helper", family_id="fam_1",
+                  session_id="fam_1_20250805_190500", token="eyJ.a-b_c", extra_params={"lang": "en"})
+
+    fast = build_pwa_deeplink(pwa_host="purplewarren.github.io", **kwargs)
+    slow = build_pwa_deeplink(pwa_host="https://purplewarren.github.io", **kwargs)
+
+    assert fast == slow == ("https://purplewarren.github.io/silli-meter?mode=helper&family=fam_1"
+                            "&session=fam_1_20250805_190500&dyad=night&tok=eyJ.a-b_c&lang=en")
+    assert build_pwa_deeplink(pwa_host="h.io", pwa_path=None, mode="helper", family_id="fam 1",
+                              session_id="s") == "https://h.io?mode=helper&family=fam+1&session=s&dyad=night"
+
+
+def test_redact_url_token():
+    """Only the tok value is replaced; URLs without a token pass through untouched"""
+    url = build_pwa_deeplink(pwa_host="h.io", pwa_path="/m", mode="helper", family_id="fam_1",
+                             session_id="s", token="eyJ.secret")
+
+    assert redact_url_token(url) == "https://h.io/m?mode=helper&family=fam_1&session=s&dyad=night&tok=REDACTED"
+    assert redact_url_token("https://h.io/?tok=abc#frag") == "https://h.io/?tok=REDACTED#frag"
+    assert redact_url_token("https://h.io/?mytok=abc") == "https://h.io/?mytok=abc"